@@ -1,11 +1,18 @@
 import streamlit as st
 import sqlite3
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import hashlib
+import mmap
 import os
+import re
+import tempfile
+from functools import partial
+from pathlib import Path
+from PIL import Image
 
 # Page configuration
 st.set_page_config(
@@ -17,6 +24,104 @@ st.set_page_config(
 
 # Database setup
 DB_FILE = 'expense_tracker.db'
+ARCHIVE_DB_FILE = 'expense_tracker_archive.db'
+ATTACHMENT_DIR = 'attachments'
+
+# Usernames allowed to run app-wide maintenance (archiving, change log
+# compaction), as a comma-separated list in EXPENSE_TRACKER_ADMINS
+ADMIN_USERNAMES = {
+    name.strip() for name in os.environ.get('EXPENSE_TRACKER_ADMINS', '').split(',') if name.strip()
+}
+
+# Column order shared by the live transactions table and its yearly archives
+TRANSACTION_COLUMNS = (
+    'id', 'user_id', 'type', 'amount', 'date', 'vendor_client', 'category_id',
+    'payment_method', 'notes', 'is_reimbursed', 'created_at'
+)
+
+# Columns get_transactions can return, and the SQL behind each of them
+TRANSACTION_FIELDS = {
+    'id': 't.id',
+    'type': 't.type',
+    'amount': 't.amount',
+    'date': 't.date',
+    'vendor_client': 't.vendor_client',
+    'category': 'c.name',
+    'category_color': 'c.color',
+    'payment_method': 't.payment_method',
+    'notes': 't.notes',
+    'is_reimbursed': 't.is_reimbursed',
+    'attachments': '(SELECT COUNT(*) FROM attachments a WHERE a.transaction_id = t.id)',
+    'duplicate_of': '(SELECT f.duplicate_of FROM transaction_flags f WHERE f.transaction_id = t.id)',
+    'z_score': '(SELECT f.z_score FROM transaction_flags f WHERE f.transaction_id = t.id)',
+    'archived': 'NOT EXISTS (SELECT 1 FROM main.transactions live WHERE live.id = t.id)'
+}
+CREDIT_FIELDS = (
+    'id', 'user_id', 'client_name', 'amount', 'due_date', 'status',
+    'paid_date', 'notes', 'created_at'
+)
+
+PAYMENT_METHODS = ["Credit Card", "Debit Card", "E-transfer", "Cash", "Check", "PayPal", "Bank Transfer"]
+PAGE_SIZES = [25, 50, 100, 250]
+
+# Transaction columns the derived tables (running balances, ...) are built from
+EFFECT_COLUMNS = ('id', 'user_id', 'type', 'amount', 'date', 'vendor_client', 'category_id')
+
+# Transaction fields the bulk editor writes, in INSERT/UPDATE parameter order
+EDITABLE_FIELDS = (
+    'type', 'amount', 'date', 'vendor_client', 'category_id',
+    'payment_method', 'notes', 'is_reimbursed'
+)
+
+# Duplicate and outlier detection on new transactions
+DUPLICATE_WINDOW_DAYS = 3
+OUTLIER_MIN_COUNT = 5
+OUTLIER_Z_SCORE = 3.0
+# Smallest spread assumed around a vendor's mean, as a fraction of it, so a
+# vendor billed the same amount every time still flags a mistyped amount
+OUTLIER_MIN_SPREAD = 0.1
+
+# Budget utilization from which a category is shown as close to its budget
+BUDGET_WARNING_RATIO = 0.8
+
+# Tables whose inserts, updates and deletes are recorded in the change log
+JOURNALED_TABLES = ('transactions', 'credits_tracking', 'recurring_transactions', 'categories')
+CHANGE_LOG_RETENTION_DAYS = 90
+
+# Receipt attachments
+ATTACHMENT_TYPES = ['png', 'jpg', 'jpeg', 'gif', 'webp', 'pdf']
+BLOB_CHUNK_SIZE = 1024 * 1024
+THUMBNAIL_SIZE = 160
+
+# Recurring schedule steps: (days, months) per occurrence
+FREQUENCY_STEPS = {
+    'daily': (1, 0),
+    'weekly': (7, 0),
+    'monthly': (0, 1),
+    'quarterly': (0, 3),
+    'yearly': (0, 12)
+}
+FORECAST_MONTHS = [3, 6, 12]
+# Cached forecasts are keyed by data version and day, so old entries are
+# never hit again; bound the cache by count and age
+FORECAST_CACHE_ENTRIES = 256
+FORECAST_CACHE_TTL = timedelta(days=1)
+ROLLING_WINDOWS = [30, 90]
+# Dashboard periods and how far back their previous period starts, in months
+PERIOD_SHIFTS = {'This Month': 1, 'This Quarter': 3, 'This Year': 12}
+
+# Accounts-receivable aging buckets: (column, label, min days past due, max days past due)
+AGING_BUCKETS = [
+    ('current', 'Current', None, 0),
+    ('days_1_30', '1–30 days', 1, 30),
+    ('days_31_60', '31–60 days', 31, 60),
+    ('days_61_90', '61–90 days', 61, 90),
+    ('days_90_plus', '90+ days', 91, None)
+]
+
+# Compact dtypes for lean DataFrames
+CATEGORICAL_COLUMNS = {'type', 'category', 'category_color', 'payment_method', 'status'}
+DATE_COLUMNS = {'date', 'due_date', 'paid_date', 'created_at'}
 
 def init_database():
     """Initialize SQLite database with all required tables"""
@@ -45,6 +150,18 @@ def init_database():
         )
     ''')
     
+    # Monthly budgets per user and category (default categories are shared)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS category_budgets (
+            user_id INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            monthly_budget REAL NOT NULL,
+            PRIMARY KEY (user_id, category_id),
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (category_id) REFERENCES categories(id)
+        ) WITHOUT ROWID
+    ''')
+    
     # Transactions table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS transactions (
@@ -100,6 +217,144 @@ def init_database():
         )
     ''')
     
+    # Receipt attachments (file bytes live in the content-addressed blob store)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attachments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            filename TEXT,
+            mime_type TEXT,
+            size INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (transaction_id) REFERENCES transactions(id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attachments_transaction ON attachments (transaction_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attachments_sha256 ON attachments (sha256)')
+    
+    # Auto-categorization rules (every condition that is set has to match)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS category_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            priority INTEGER DEFAULT 0,
+            vendor_keyword TEXT,
+            pattern TEXT,
+            min_amount REAL,
+            max_amount REAL,
+            payment_method TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (category_id) REFERENCES categories(id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_category_rules_user ON category_rules (user_id, priority)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_uncategorized ON transactions (user_id) WHERE category_id IS NULL')
+    
+    # Daily running balance per user (net flow per day and its prefix sum)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_balances (
+            user_id INTEGER NOT NULL,
+            date DATE NOT NULL,
+            net_flow REAL NOT NULL DEFAULT 0,
+            balance REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, date)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Running amount statistics per (user, vendor/client, category) for outliers
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transaction_stats (
+            user_id INTEGER NOT NULL,
+            vendor_client TEXT NOT NULL,
+            category_id INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            mean REAL NOT NULL DEFAULT 0,
+            m2 REAL NOT NULL DEFAULT 0,
+            last_date DATE,
+            PRIMARY KEY (user_id, vendor_client, category_id)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Likely duplicates and outliers, flagged as transactions are written
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transaction_flags (
+            transaction_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            duplicate_of INTEGER,
+            z_score REAL,
+            FOREIGN KEY (transaction_id) REFERENCES transactions(id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transaction_flags_duplicate ON transaction_flags (duplicate_of) WHERE duplicate_of IS NOT NULL')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_duplicate ON transactions (user_id, vendor_client, amount, date)')
+    
+    # Running per-month counters per category: all rows and purchase/expense spend
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS category_spend (
+            user_id INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            spent REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, category_id, month)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Derived tables that have had their one-time full build from existing data
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS derived_tables (
+            name TEXT PRIMARY KEY,
+            built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Archived years (closed years moved out to the archive database)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archived_years (
+            year INTEGER PRIMARY KEY,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions (user_id, date)')
+    # Covers the overdue update, the aging report and per-client balances
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_credits_aging
+        ON credits_tracking (user_id, status, due_date, client_name, amount)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_credits_user_due ON credits_tracking (user_id, due_date)')
+    
+    # Change log (append-only journal filled by triggers)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            operation TEXT NOT NULL CHECK(operation IN ('insert', 'update', 'delete')),
+            row_id INTEGER NOT NULL,
+            user_id INTEGER,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_change_log_user_seq ON change_log (user_id, seq)')
+    
+    for table in JOURNALED_TABLES:
+        for operation, row in (('insert', 'NEW'), ('update', 'NEW'), ('delete', 'OLD')):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation}
+                AFTER {operation.upper()} ON {table}
+                BEGIN
+                    INSERT INTO change_log (table_name, operation, row_id, user_id)
+                    VALUES ('{table}', '{operation}', {row}.id, {row}.user_id);
+                END
+            ''')
+    
     # Insert default categories
     cursor.execute("SELECT COUNT(*) FROM categories WHERE user_id IS NULL")
     if cursor.fetchone()[0] == 0:
@@ -118,8 +373,224 @@ def init_database():
             default_categories
         )
     
+    # Derived tables are built once from data written before they existed,
+    # then kept up to date by the write path
+    built = {row[0] for row in cursor.execute('SELECT name FROM derived_tables')}
+    
     conn.commit()
     conn.close()
+    
+    if 'daily_balances' not in built:
+        rebuild_daily_balances()
+    if 'transaction_stats' not in built:
+        score_transactions()
+    if 'category_spend' not in built:
+        rebuild_category_spend()
+
+def _mark_built(cursor, name):
+    """Record that a derived table has been fully built"""
+    cursor.execute('INSERT OR REPLACE INTO derived_tables (name) VALUES (?)', (name,))
+
+def _year_of(value):
+    """Year of a date, datetime or ISO date string"""
+    return int(str(value)[:4])
+
+def open_transactions(start_date=None, end_date=None):
+    """Open a connection and the transactions source covering a date range
+    
+    Archived years are only attached when the range reaches into them, so
+    queries over recent data never touch the archive database. Returns the
+    connection and a FROM-clause source for the transactions rows.
+    """
+    conn = sqlite3.connect(DB_FILE, uri=True)
+    
+    query = 'SELECT year FROM archived_years WHERE 1 = 1'
+    params = []
+    if start_date:
+        query += ' AND year >= ?'
+        params.append(_year_of(start_date))
+    if end_date:
+        query += ' AND year <= ?'
+        params.append(_year_of(end_date))
+    years = [row[0] for row in conn.execute(query + ' ORDER BY year', params)]
+    
+    if not years or not os.path.exists(ARCHIVE_DB_FILE):
+        return conn, 'transactions'
+    
+    # Archives are only ever read through here, so attach them read-only
+    archive_uri = Path(ARCHIVE_DB_FILE).resolve().as_uri() + '?mode=ro'
+    conn.execute('ATTACH DATABASE ? AS archive', (archive_uri,))
+    
+    columns = ', '.join(TRANSACTION_COLUMNS)
+    parts = [f'SELECT {columns} FROM main.transactions']
+    parts += [f'SELECT {columns} FROM archive.transactions_{year}' for year in years]
+    return conn, '(' + ' UNION ALL '.join(parts) + ')'
+
+def get_archived_years():
+    """Get archived years with their row counts"""
+    conn = sqlite3.connect(DB_FILE)
+    df = pd.read_sql_query('SELECT year, row_count, archived_at FROM archived_years ORDER BY year', conn)
+    conn.close()
+    return df
+
+def archive_closed_years(before_year=None, read_only=False):
+    """Move transactions of closed years into yearly archive partitions
+    
+    Every year before `before_year` (default: the current year) gets its own
+    `transactions_<year>` table in the archive database. Back-dated entries
+    added after a year was archived are appended on the next run. This moves
+    every user's rows, so it is an admin action. The archive is vacuumed
+    afterwards and its file can optionally be made read-only; that is only a
+    permission bit, which a process running as root ignores. Outside of this
+    function the app only ever attaches the archive with mode=ro.
+    """
+    before_year = before_year or datetime.now().year
+    
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT DISTINCT CAST(strftime('%Y', date) AS INTEGER) FROM transactions WHERE date < ?",
+        (f'{before_year}-01-01',)
+    )
+    years = sorted(row[0] for row in cursor.fetchall())
+    if not years:
+        conn.close()
+        return []
+    
+    if os.path.exists(ARCHIVE_DB_FILE):
+        os.chmod(ARCHIVE_DB_FILE, 0o644)
+    cursor.execute('ATTACH DATABASE ? AS archive', (ARCHIVE_DB_FILE,))
+    
+    columns = ', '.join(TRANSACTION_COLUMNS)
+    for year in years:
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS archive.transactions_{year} (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                type TEXT NOT NULL,
+                amount REAL NOT NULL,
+                date DATE NOT NULL,
+                vendor_client TEXT,
+                category_id INTEGER,
+                payment_method TEXT,
+                notes TEXT,
+                is_reimbursed BOOLEAN DEFAULT 0,
+                created_at TIMESTAMP
+            )
+        ''')
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS archive.idx_transactions_{year}_user_date '
+            f'ON transactions_{year} (user_id, date)'
+        )
+        
+        bounds = (f'{year}-01-01', f'{year + 1}-01-01')
+        cursor.execute(f'''
+            INSERT INTO archive.transactions_{year} ({columns})
+            SELECT {columns} FROM main.transactions WHERE date >= ? AND date < ?
+        ''', bounds)
+        moved = cursor.rowcount
+        cursor.execute('DELETE FROM main.transactions WHERE date >= ? AND date < ?', bounds)
+        cursor.execute('''
+            INSERT INTO archived_years (year, row_count) VALUES (?, ?)
+            ON CONFLICT(year) DO UPDATE SET
+                row_count = row_count + excluded.row_count,
+                archived_at = CURRENT_TIMESTAMP
+        ''', (year, moved))
+    
+    conn.commit()
+    cursor.execute('DETACH DATABASE archive')
+    conn.close()
+    
+    # Compact the archive now that it only grows by whole years
+    archive = sqlite3.connect(ARCHIVE_DB_FILE)
+    archive.execute('VACUUM')
+    archive.close()
+    if read_only:
+        os.chmod(ARCHIVE_DB_FILE, 0o444)
+    
+    return years
+
+def _change_log_floor(conn):
+    """Highest sequence number compacted out of the change log
+    
+    Compaction only ever removes a prefix of the log, so everything up to the
+    floor is gone and everything after it is still there.
+    """
+    return conn.execute('''
+        SELECT COALESCE(
+            (SELECT MIN(seq) FROM change_log) - 1,
+            (SELECT seq FROM sqlite_sequence WHERE name = 'change_log'),
+            0
+        )
+    ''').fetchone()[0]
+
+def get_change_version(user_id=None):
+    """Latest change log sequence number, usable as a data version
+    
+    With a user, only that user's changes and changes to shared rows (the
+    default categories) count. The version never goes backwards, even when
+    compaction removes the entries it came from.
+    """
+    conn = sqlite3.connect(DB_FILE)
+    if user_id is None:
+        latest = conn.execute('SELECT MAX(seq) FROM change_log').fetchone()[0]
+    else:
+        # Two separate MAX lookups each resolve with a single index probe
+        latest = conn.execute('''
+            SELECT MAX(
+                COALESCE((SELECT MAX(seq) FROM change_log WHERE user_id = ?), 0),
+                COALESCE((SELECT MAX(seq) FROM change_log WHERE user_id IS NULL), 0)
+            )
+        ''', (user_id,)).fetchone()[0]
+    
+    version = max(latest or 0, _change_log_floor(conn))
+    conn.close()
+    return version
+
+def get_changes(since_seq=0, user_id=None, tables=None, limit=None):
+    """Get change log entries recorded after `since_seq`
+    
+    Returns None when entries after `since_seq` have already been compacted
+    away, in which case the caller has to resync from the tables themselves.
+    Archiving a year shows up as deletes from the live transactions table.
+    """
+    conn = sqlite3.connect(DB_FILE)
+    
+    if since_seq < _change_log_floor(conn):
+        conn.close()
+        return None
+    
+    query = 'SELECT seq, table_name, operation, row_id, user_id, changed_at FROM change_log WHERE seq > ?'
+    params = [since_seq]
+    
+    if user_id is not None:
+        query += ' AND (user_id = ? OR user_id IS NULL)'
+        params.append(user_id)
+    if tables:
+        query += f" AND table_name IN ({', '.join('?' for _ in tables)})"
+        params.extend(tables)
+    
+    query += ' ORDER BY seq'
+    if limit:
+        query += ' LIMIT ?'
+        params.append(limit)
+    
+    df = pd.read_sql_query(query, conn, params=params)
+    conn.close()
+    return df
+
+def compact_change_log(retention_days=CHANGE_LOG_RETENTION_DAYS):
+    """Drop change log entries older than the retention window"""
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    cursor.execute('''
+        DELETE FROM change_log
+        WHERE seq <= (SELECT MAX(seq) FROM change_log WHERE changed_at < datetime('now', ?))
+    ''', (f'-{retention_days} days',))
+    removed = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return removed
 
 def hash_password(password):
     """Hash password using SHA-256"""
@@ -159,81 +630,1121 @@ def register_user(username, email, password):
         conn.close()
         return False, None
 
-def get_categories(user_id):
-    """Get all categories for user"""
-    conn = sqlite3.connect(DB_FILE)
-    query = 'SELECT id, name, color FROM categories WHERE user_id IS NULL OR user_id = ?'
-    df = pd.read_sql_query(query, conn, params=(user_id,))
-    conn.close()
-    return df
+def get_categories(user_id):
+    """Get all categories for user"""
+    conn = sqlite3.connect(DB_FILE)
+    query = 'SELECT id, name, color FROM categories WHERE user_id IS NULL OR user_id = ?'
+    df = pd.read_sql_query(query, conn, params=(user_id,))
+    conn.close()
+    return df
+
+def add_transaction(user_id, trans_type, amount, date, vendor, category_id, payment_method, notes, is_reimbursed):
+    """Add new transaction"""
+    if category_id is None:
+        category_id = categorize_transaction(user_id, amount, vendor, payment_method, notes)
+    
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        INSERT INTO transactions 
+        (user_id, type, amount, date, vendor_client, category_id, payment_method, notes, is_reimbursed)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (user_id, trans_type, amount, date, vendor, category_id, payment_method, notes, is_reimbursed))
+    _apply_transaction_effects(cursor, added=[{
+        'id': cursor.lastrowid, 'user_id': user_id, 'type': trans_type, 'amount': amount,
+        'date': date, 'vendor_client': vendor, 'category_id': category_id
+    }])
+    
+    conn.commit()
+    conn.close()
+
+def compact_dtypes(df):
+    """Convert a query result to compact dtypes
+    
+    Low-cardinality text becomes categorical, dates become datetime64, and
+    ids and flags are downcast. Amounts stay float64: callers sum them, and
+    float32 totals drift by dollars over large frames.
+    """
+    for column in df.columns:
+        if column in CATEGORICAL_COLUMNS:
+            df[column] = df[column].astype('category')
+        elif column in DATE_COLUMNS:
+            df[column] = pd.to_datetime(df[column], format='ISO8601', errors='coerce')
+        elif column == 'is_reimbursed':
+            df[column] = df[column].fillna(0).astype(bool)
+        elif column in ('id', 'user_id'):
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+    return df
+
+def _transactions_where(user_id, filters):
+    """WHERE clause and params for the get_transactions filters"""
+    query = ' WHERE t.user_id = ?'
+    params = [user_id]
+    
+    if filters.get('type'):
+        query += ' AND t.type = ?'
+        params.append(filters['type'])
+    if filters.get('start_date'):
+        query += ' AND t.date >= ?'
+        params.append(filters['start_date'])
+    if filters.get('end_date'):
+        query += ' AND t.date <= ?'
+        params.append(filters['end_date'])
+    if filters.get('category'):
+        query += ' AND c.name = ?'
+        params.append(filters['category'])
+    if filters.get('flagged'):
+        query += ' AND EXISTS (SELECT 1 FROM transaction_flags f WHERE f.transaction_id = t.id)'
+    
+    return query, params
+
+def get_transactions(user_id, filters=None, columns=None, compact=False, limit=None, offset=0):
+    """Get transactions with optional filters
+    
+    `columns` limits the result to a subset of TRANSACTION_FIELDS (the
+    categories join is skipped when no category column is needed) and
+    `compact` returns compact dtypes instead of object columns. `limit` and
+    `offset` return a single page of the newest-first list.
+    """
+    filters = filters or {}
+    columns = [column for column in (columns or TRANSACTION_FIELDS) if column in TRANSACTION_FIELDS]
+    conn, source = open_transactions(filters.get('start_date'), filters.get('end_date'))
+    
+    select = ', '.join(f'{TRANSACTION_FIELDS[column]} as {column}' for column in columns)
+    query = f'''
+        SELECT {select}
+        FROM {source} t
+    '''
+    if filters.get('category') or {'category', 'category_color'} & set(columns):
+        query += ' LEFT JOIN categories c ON t.category_id = c.id'
+    where, params = _transactions_where(user_id, filters)
+    query += where
+    
+    query += ' ORDER BY t.date DESC, t.created_at DESC, t.id DESC'
+    if limit:
+        query += ' LIMIT ? OFFSET ?'
+        params += [limit, offset]
+    
+    df = pd.read_sql_query(query, conn, params=params)
+    conn.close()
+    return compact_dtypes(df) if compact else df
+
+def count_transactions(user_id, filters=None):
+    """Count transactions matching the get_transactions filters"""
+    filters = filters or {}
+    conn, source = open_transactions(filters.get('start_date'), filters.get('end_date'))
+    
+    query = f'SELECT COUNT(*) FROM {source} t'
+    if filters.get('category'):
+        query += ' LEFT JOIN categories c ON t.category_id = c.id'
+    where, params = _transactions_where(user_id, filters)
+    
+    count = conn.execute(query + where, params).fetchone()[0]
+    conn.close()
+    return count
+
+def delete_transaction(transaction_id):
+    """Delete a transaction
+    
+    Archived transactions are read-only, so only live rows are deleted.
+    Returns whether a row was deleted.
+    """
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    # Lock before reading the row, so the derived tables only ever see a
+    # delete this connection actually makes
+    cursor.execute('BEGIN IMMEDIATE')
+    removed = _fetch_transactions(cursor, [transaction_id])
+    if not removed:
+        conn.close()
+        return False
+    
+    cursor.execute('DELETE FROM transactions WHERE id = ?', (transaction_id,))
+    _apply_transaction_effects(cursor, removed=removed)
+    digests = _delete_attachments(cursor, [transaction_id])
+    conn.commit()
+    _remove_unreferenced_blobs(conn, digests)
+    conn.close()
+    return True
+
+def diff_transactions(original, edited, category_ids):
+    """Diff an edited transactions grid against the rows it was loaded from
+    
+    `category_ids` maps category names to ids. Returns (inserts, updates,
+    deletes) as parameter tuples ready for apply_transaction_edits. New rows
+    still missing a type, amount or date are left out.
+    """
+    def clean(value):
+        return None if pd.isna(value) else value
+    
+    def row_values(row):
+        category = clean(row['category'])
+        return (
+            row['type'],
+            round(float(row['amount']), 2),
+            pd.Timestamp(row['date']).date().isoformat(),
+            clean(row['vendor_client']),
+            int(category_ids[category]) if category in category_ids else None,
+            clean(row['payment_method']),
+            clean(row['notes']),
+            bool(clean(row['is_reimbursed']))
+        )
+    
+    before = {int(row['id']): row_values(row) for _, row in original.iterrows()}
+    kept_ids = set(edited['id'].dropna().astype(int))
+    complete = edited.dropna(subset=['type', 'amount', 'date'])
+    
+    inserts = [row_values(row) for _, row in complete[complete['id'].isna()].iterrows()]
+    updates = []
+    for _, row in complete[complete['id'].notna()].iterrows():
+        values = row_values(row)
+        if before.get(int(row['id'])) != values:
+            updates.append(values + (int(row['id']),))
+    deletes = [(transaction_id,) for transaction_id in before if transaction_id not in kept_ids]
+    
+    return inserts, updates, deletes
+
+def apply_transaction_edits(user_id, inserts, updates, deletes):
+    """Apply a bulk-edit diff in a single database transaction
+    
+    New rows without a category go through the auto-categorization rules.
+    """
+    inserts = _categorize_rows(user_id, inserts)
+    
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    # Rows as they were before the edit, for the derived tables, read under
+    # the write lock so no other session can change them in between
+    cursor.execute('BEGIN IMMEDIATE')
+    removed = _fetch_transactions(cursor, [row[-1] for row in updates] + [row[0] for row in deletes], user_id)
+    
+    cursor.executemany(f'''
+        INSERT INTO transactions (user_id, {', '.join(EDITABLE_FIELDS)})
+        VALUES (?, {', '.join('?' for _ in EDITABLE_FIELDS)})
+    ''', [(user_id,) + row for row in inserts])
+    # The batch gets consecutive ids while this transaction holds the write lock
+    first_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0] - len(inserts) + 1
+    cursor.executemany(f'''
+        UPDATE transactions SET {', '.join(f'{field} = ?' for field in EDITABLE_FIELDS)}
+        WHERE id = ? AND user_id = ?
+    ''', [row + (user_id,) for row in updates])
+    cursor.executemany(
+        'DELETE FROM transactions WHERE id = ? AND user_id = ?',
+        [row + (user_id,) for row in deletes]
+    )
+    # Only the user's live rows were deleted; archived rows are read-only
+    owned = {row['id'] for row in removed}
+    digests = _delete_attachments(cursor, [row[0] for row in deletes if row[0] in owned])
+    
+    added = [
+        dict(zip(EDITABLE_FIELDS, row), id=first_id + i, user_id=user_id)
+        for i, row in enumerate(inserts)
+    ]
+    # Updates likewise only land on the rows fetched above
+    added += [
+        dict(zip(EDITABLE_FIELDS, row[:-1]), id=row[-1], user_id=user_id)
+        for row in updates if row[-1] in owned
+    ]
+    _apply_transaction_effects(cursor, removed=removed, added=added)
+    
+    conn.commit()
+    _remove_unreferenced_blobs(conn, digests)
+    conn.close()
+
+def _iso_date(value):
+    """ISO date string for a date, datetime or date string"""
+    return pd.Timestamp(value).date().isoformat()
+
+def _signed_amount(trans_type, amount):
+    """Cash effect of a transaction: credits in, purchases and expenses out"""
+    return amount if trans_type == 'credit' else -amount
+
+def _fetch_transactions(cursor, transaction_ids, user_id=None):
+    """Rows (as dicts of EFFECT_COLUMNS) for transactions about to change"""
+    if not transaction_ids:
+        return []
+    
+    query = f'''
+        SELECT {', '.join(EFFECT_COLUMNS)} FROM transactions
+        WHERE id IN ({', '.join('?' for _ in transaction_ids)})
+    '''
+    params = list(transaction_ids)
+    if user_id is not None:
+        query += ' AND user_id = ?'
+        params.append(user_id)
+    
+    cursor.execute(query, params)
+    return [dict(zip(EFFECT_COLUMNS, row)) for row in cursor.fetchall()]
+
+def _apply_transaction_effects(cursor, removed=(), added=()):
+    """Keep the tables derived from transactions in step with a write
+    
+    `removed` and `added` are rows as dicts of EFFECT_COLUMNS; an update is
+    the old row removed plus the new row added. Runs inside the writer's
+    database transaction.
+    """
+    _update_daily_balances(cursor, [(row, -1) for row in removed] + [(row, 1) for row in added])
+    
+    _clear_transaction_flags(
+        cursor,
+        [row['id'] for row in removed],
+        {row['id'] for row in removed} - {row['id'] for row in added}
+    )
+    for row in removed:
+        _update_transaction_stats(cursor, row, -1)
+        _update_category_spend(cursor, row, -1)
+    # Each row is scored against the history before it, then joins it
+    rewritten = {row['id'] for row in removed}
+    for row in added:
+        _flag_transaction(cursor, row, new=row['id'] not in rewritten)
+        _update_transaction_stats(cursor, row, 1)
+        _update_category_spend(cursor, row, 1)
+
+def _update_daily_balances(cursor, changes):
+    """Apply (row, +1/-1) changes to the running-balance index
+    
+    A change on a day shifts that day's net flow and the balance of that day
+    and every later day, so entries for today touch a single row and
+    back-dated ones touch the days after them.
+    """
+    deltas = {}
+    for row, sign in changes:
+        key = (row['user_id'], _iso_date(row['date']))
+        deltas[key] = deltas.get(key, 0) + sign * _signed_amount(row['type'], float(row['amount']))
+    
+    for (user_id, day), delta in sorted(deltas.items()):
+        if not round(delta, 2):
+            continue
+        
+        # New days start from the closing balance of the day before them
+        cursor.execute('''
+            INSERT OR IGNORE INTO daily_balances (user_id, date, net_flow, balance)
+            VALUES (?, ?, 0, COALESCE((
+                SELECT balance FROM daily_balances
+                WHERE user_id = ? AND date < ?
+                ORDER BY date DESC LIMIT 1
+            ), 0))
+        ''', (user_id, day, user_id, day))
+        cursor.execute(
+            'UPDATE daily_balances SET net_flow = ROUND(net_flow + ?, 2) WHERE user_id = ? AND date = ?',
+            (delta, user_id, day)
+        )
+        cursor.execute(
+            'UPDATE daily_balances SET balance = ROUND(balance + ?, 2) WHERE user_id = ? AND date >= ?',
+            (delta, user_id, day)
+        )
+        
+        # A day whose transactions are all gone carries no information
+        cursor.execute(
+            'DELETE FROM daily_balances WHERE user_id = ? AND date = ? AND net_flow = 0',
+            (user_id, day)
+        )
+
+def _stats_key(row):
+    """transaction_stats key for a transaction row"""
+    return (row['user_id'], row['vendor_client'] or '', int(row['category_id'] or 0))
+
+def _update_transaction_stats(cursor, row, sign):
+    """Add (+1) or remove (-1) a transaction in its running amount statistics
+    
+    Welford's update, run backwards for removals, so each change reads and
+    writes a single row. The last-seen date only moves forward.
+    """
+    key = _stats_key(row)
+    amount = float(row['amount'])
+    day = _iso_date(row['date'])
+    
+    cursor.execute('''
+        SELECT count, mean, m2, last_date FROM transaction_stats
+        WHERE user_id = ? AND vendor_client = ? AND category_id = ?
+    ''', key)
+    count, mean, m2, last_date = cursor.fetchone() or (0, 0.0, 0.0, None)
+    
+    if sign > 0:
+        count += 1
+        delta = amount - mean
+        mean += delta / count
+        m2 += delta * (amount - mean)
+        last_date = max(last_date or day, day)
+    elif count > 1:
+        previous_mean = mean
+        mean = (count * mean - amount) / (count - 1)
+        m2 -= (amount - mean) * (amount - previous_mean)
+        count -= 1
+    else:
+        count = 0
+    
+    if count:
+        cursor.execute('''
+            INSERT OR REPLACE INTO transaction_stats (user_id, vendor_client, category_id, count, mean, m2, last_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', key + (count, mean, max(m2, 0.0), last_date))
+    else:
+        cursor.execute(
+            'DELETE FROM transaction_stats WHERE user_id = ? AND vendor_client = ? AND category_id = ?',
+            key
+        )
+
+def _outlier_z_score(amount, count, mean, m2):
+    """z-score of an amount against running stats, or None when it is not an outlier"""
+    if count < OUTLIER_MIN_COUNT:
+        return None
+    
+    spread = max((m2 / (count - 1)) ** 0.5, abs(mean) * OUTLIER_MIN_SPREAD)
+    z_score = (amount - mean) / spread if spread else 0.0
+    return round(z_score, 2) if abs(z_score) >= OUTLIER_Z_SCORE else None
+
+def _find_duplicate(cursor, row, new=True):
+    """Id of another entry of the same vendor and amount a few days either side
+    
+    One lookup on idx_transactions_duplicate. New rows only match entries
+    made before them; edited rows match any entry not already flagged as a
+    duplicate of them. None when there is no match.
+    """
+    day = pd.Timestamp(row['date'])
+    window = timedelta(days=DUPLICATE_WINDOW_DAYS)
+    # A missing vendor and a blank one count as the same, as in the stats
+    vendor = row['vendor_client'] or ''
+    vendor_match = 'vendor_client = ?' if vendor else "(vendor_client IS NULL OR vendor_client = '')"
+    cursor.execute(f'''
+        SELECT id FROM transactions t
+        WHERE user_id = ? AND {vendor_match} AND amount = ?
+          AND date BETWEEN ? AND ? AND id {'<' if new else '!='} ?
+          AND NOT EXISTS (
+              SELECT 1 FROM transaction_flags f
+              WHERE f.transaction_id = t.id AND f.duplicate_of = ?
+          )
+        ORDER BY id LIMIT 1
+    ''', (row['user_id'],) + ((vendor,) if vendor else ()) + (
+        row['amount'], _iso_date(day - window), _iso_date(day + window), row['id'], row['id']
+    ))
+    duplicate = cursor.fetchone()
+    return duplicate[0] if duplicate else None
+
+def _flag_transaction(cursor, row, new=True):
+    """Flag a just-written transaction as a likely duplicate and/or outlier
+    
+    One duplicate lookup (see _find_duplicate) and one read of its running
+    stats.
+    """
+    duplicate = _find_duplicate(cursor, row, new)
+    cursor.execute('''
+        SELECT count, mean, m2 FROM transaction_stats
+        WHERE user_id = ? AND vendor_client = ? AND category_id = ?
+    ''', _stats_key(row))
+    stats = cursor.fetchone()
+    z_score = _outlier_z_score(float(row['amount']), *stats) if stats else None
+    
+    if duplicate or z_score is not None:
+        cursor.execute(
+            'INSERT OR REPLACE INTO transaction_flags (transaction_id, user_id, duplicate_of, z_score) VALUES (?, ?, ?, ?)',
+            (row['id'], row['user_id'], duplicate, z_score)
+        )
+
+def _clear_transaction_flags(cursor, transaction_ids, gone_ids):
+    """Drop the flags of rewritten rows and relink duplicates of deleted ones
+    
+    A row flagged as a duplicate of a deleted row is looked up again against
+    the rows that remain, in id order, so the earliest remaining copy becomes
+    the original the others point to.
+    """
+    if transaction_ids:
+        cursor.execute(
+            f'DELETE FROM transaction_flags WHERE transaction_id IN ({", ".join("?" for _ in transaction_ids)})',
+            list(transaction_ids)
+        )
+    if gone_ids:
+        placeholders = ', '.join('?' for _ in gone_ids)
+        cursor.execute(
+            f'SELECT transaction_id FROM transaction_flags WHERE duplicate_of IN ({placeholders})',
+            list(gone_ids)
+        )
+        orphans = _fetch_transactions(cursor, [row[0] for row in cursor.fetchall()])
+        for row in sorted(orphans, key=lambda row: row['id']):
+            cursor.execute(
+                'UPDATE transaction_flags SET duplicate_of = ? WHERE transaction_id = ?',
+                (_find_duplicate(cursor, row), row['id'])
+            )
+            cursor.execute(
+                'DELETE FROM transaction_flags WHERE transaction_id = ? AND duplicate_of IS NULL AND z_score IS NULL',
+                (row['id'],)
+            )
+        
+        # Archived rows can't be looked up again, so they just lose the link
+        cursor.execute(
+            f'DELETE FROM transaction_flags WHERE duplicate_of IN ({placeholders}) AND z_score IS NULL',
+            list(gone_ids)
+        )
+        cursor.execute(
+            f'UPDATE transaction_flags SET duplicate_of = NULL WHERE duplicate_of IN ({placeholders})',
+            list(gone_ids)
+        )
+
+def _earliest_duplicates(df):
+    """Lowest earlier id with the same user, vendor and amount within the window
+    
+    Sorting by (user, vendor, amount, date) turns every row's window into a
+    contiguous run found by binary search, and a sparse table of running
+    minimums answers the lowest id of all runs at once, in O(n log n) however
+    many identical entries there are. NaN where a row has no earlier match.
+    """
+    if df.empty:
+        return pd.Series(dtype=float, index=df.index)
+    
+    group = df.groupby(['user_id', 'vendor_client', 'amount'], sort=False).ngroup().to_numpy()
+    day = pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]').astype(np.int64)
+    day -= day.min()
+    # Groups are spaced further apart than any window reaches
+    position = group * (day.max() + 2 * DUPLICATE_WINDOW_DAYS + 1) + day
+    order = np.argsort(position, kind='stable')
+    position = position[order]
+    ids = df['id'].to_numpy()[order]
+    
+    start = np.searchsorted(position, position - DUPLICATE_WINDOW_DAYS, 'left')
+    stop = np.searchsorted(position, position + DUPLICATE_WINDOW_DAYS, 'right')
+    
+    # levels[k][i] is the lowest id in ids[i:i + 2**k]
+    levels = [ids]
+    while 2 ** len(levels) <= len(ids):
+        step = 2 ** (len(levels) - 1)
+        levels.append(np.minimum(levels[-1][:-step], levels[-1][step:]))
+    
+    lowest = np.empty_like(ids)
+    level = np.log2(stop - start).astype(int)
+    for k, minimums in enumerate(levels):
+        rows = level == k
+        lowest[rows] = np.minimum(minimums[start[rows]], minimums[stop[rows] - 2 ** k])
+    
+    # Each window holds the row itself, so a lower id is an earlier entry
+    duplicate = np.where(lowest < ids, lowest, np.nan)
+    result = np.empty(len(ids))
+    result[order] = duplicate
+    return pd.Series(result, index=df.index)
+
+def score_transactions(user_id=None):
+    """Rebuild the running stats and flags from all live transactions at once
+    
+    Batch counterpart of the write-path detector for imports and for data
+    written before it existed: rows are scored in entry order against the
+    rows entered before them, exactly as they would have been one at a time,
+    but in a single vectorized pass. Returns the number of flagged rows.
+    """
+    conn = sqlite3.connect(DB_FILE)
+    where = 'WHERE user_id = ?' if user_id is not None else ''
+    params = (user_id,) if user_id is not None else ()
+    df = pd.read_sql_query(f'''
+        SELECT id, user_id, vendor_client, category_id, amount, date(date) as date
+        FROM transactions {where}
+        ORDER BY id
+    ''', conn, params=params)
+    
+    df['vendor_client'] = df['vendor_client'].fillna('')
+    df['category_id'] = df['category_id'].fillna(0).astype(int)
+    df['amount'] = df['amount'].astype(float)
+    key = ['user_id', 'vendor_client', 'category_id']
+    
+    # Stats of the rows entered before each row, from running sums
+    groups = df.groupby(key, sort=False)['amount']
+    count = groups.cumcount()
+    total = groups.cumsum() - df['amount']
+    squares = (df['amount'] ** 2).groupby([df[column] for column in key], sort=False).cumsum() - df['amount'] ** 2
+    mean = (total / count).fillna(0.0)
+    m2 = (squares - count * mean ** 2).clip(lower=0)
+    
+    # Same rule as _outlier_z_score, over whole columns
+    spread = np.maximum(np.sqrt(m2 / np.maximum(count - 1, 1)), mean.abs() * OUTLIER_MIN_SPREAD)
+    z_score = np.where(spread > 0, (df['amount'] - mean) / spread.where(spread > 0, 1.0), 0.0)
+    outlier = (count >= OUTLIER_MIN_COUNT) & (np.abs(z_score) >= OUTLIER_Z_SCORE)
+    df['z_score'] = np.where(outlier, np.round(z_score, 2), np.nan)
+    
+    df['duplicate_of'] = _earliest_duplicates(df)
+    
+    stats = df.groupby(key, sort=False).agg(
+        count=('amount', 'size'),
+        mean=('amount', 'mean'),
+        var=('amount', 'var'),
+        last_date=('date', 'max')
+    ).reset_index()
+    stats['m2'] = (stats['var'].fillna(0.0) * (stats['count'] - 1)).clip(lower=0)
+    flags = df[df['duplicate_of'].notna() | df['z_score'].notna()]
+    
+    cursor = conn.cursor()
+    cursor.execute(f'DELETE FROM transaction_stats {where}', params)
+    cursor.execute(f'DELETE FROM transaction_flags {where}', params)
+    cursor.executemany('''
+        INSERT INTO transaction_stats (user_id, vendor_client, category_id, count, mean, m2, last_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', stats[key + ['count', 'mean', 'm2', 'last_date']].itertuples(index=False))
+    cursor.executemany(
+        'INSERT INTO transaction_flags (transaction_id, user_id, duplicate_of, z_score) VALUES (?, ?, ?, ?)',
+        [
+            (row.id, row.user_id, None if pd.isna(row.duplicate_of) else int(row.duplicate_of),
+             None if pd.isna(row.z_score) else row.z_score)
+            for row in flags.itertuples(index=False)
+        ]
+    )
+    if user_id is None:
+        _mark_built(cursor, 'transaction_stats')
+    
+    conn.commit()
+    conn.close()
+    return len(flags)
+
+def _update_category_spend(cursor, row, sign):
+    """Add (+1) or remove (-1) a categorized transaction in its month's counters"""
+    if row['category_id'] is None or pd.isna(row['category_id']):
+        return
+    
+    key = (row['user_id'], int(row['category_id']), _iso_date(row['date'])[:7])
+    amount = sign * float(row['amount'])
+    spent = amount if row['type'] in ('purchase', 'expense') else 0.0
+    cursor.execute('''
+        INSERT INTO category_spend (user_id, category_id, month, count, total, spent)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, category_id, month) DO UPDATE SET
+            count = count + excluded.count,
+            total = ROUND(total + excluded.total, 2),
+            spent = ROUND(spent + excluded.spent, 2)
+    ''', key + (sign, amount, spent))
+    cursor.execute(
+        'DELETE FROM category_spend WHERE user_id = ? AND category_id = ? AND month = ? AND count <= 0',
+        key
+    )
+
+def rebuild_category_spend(user_id=None):
+    """Rebuild the per-month category counters from transactions, archives included"""
+    conn, source = open_transactions()
+    cursor = conn.cursor()
+    
+    where = 'AND user_id = ?' if user_id is not None else ''
+    params = (user_id,) if user_id is not None else ()
+    cursor.execute(f'DELETE FROM category_spend WHERE 1 = 1 {where}', params)
+    cursor.execute(f'''
+        INSERT INTO category_spend (user_id, category_id, month, count, total, spent)
+        SELECT user_id, category_id, strftime('%Y-%m', date), COUNT(*), ROUND(SUM(amount), 2),
+               ROUND(SUM(CASE WHEN type IN ('purchase', 'expense') THEN amount ELSE 0 END), 2)
+        FROM {source}
+        WHERE category_id IS NOT NULL {where}
+        GROUP BY user_id, category_id, strftime('%Y-%m', date)
+    ''', params)
+    if user_id is None:
+        _mark_built(cursor, 'category_spend')
+    
+    conn.commit()
+    conn.close()
+
+def format_flags(duplicate_of, z_score):
+    """Short description of a transaction's duplicate and outlier flags"""
+    reasons = []
+    if pd.notna(duplicate_of):
+        reasons.append(f"Possible duplicate of #{int(duplicate_of)}")
+    if pd.notna(z_score):
+        reasons.append(f"Amount {abs(z_score):.1f}σ {'above' if z_score > 0 else 'below'} usual")
+    return ' • '.join(reasons)
+
+def rebuild_daily_balances(user_id=None):
+    """Rebuild the running-balance index from transactions, archives included"""
+    conn, source = open_transactions()
+    cursor = conn.cursor()
+    
+    where = 'WHERE user_id = ?' if user_id is not None else ''
+    params = (user_id,) if user_id is not None else ()
+    cursor.execute(f'DELETE FROM daily_balances {where}', params)
+    cursor.execute(f'''
+        INSERT INTO daily_balances (user_id, date, net_flow, balance)
+        SELECT user_id, day, ROUND(net_flow, 2),
+               ROUND(SUM(net_flow) OVER (PARTITION BY user_id ORDER BY day), 2)
+        FROM (
+            SELECT user_id, date(date) as day,
+                   SUM(CASE WHEN type = 'credit' THEN amount ELSE -amount END) as net_flow
+            FROM {source}
+            {where}
+            GROUP BY user_id, date(date)
+        )
+        WHERE ROUND(net_flow, 2) != 0
+    ''', params)
+    if user_id is None:
+        _mark_built(cursor, 'daily_balances')
+    
+    conn.commit()
+    conn.close()
+
+def get_balance_at(user_id, date):
+    """Net cash position (credits minus purchases and expenses) at end of a day"""
+    conn = sqlite3.connect(DB_FILE)
+    row = conn.execute('''
+        SELECT balance FROM daily_balances
+        WHERE user_id = ? AND date <= ?
+        ORDER BY date DESC LIMIT 1
+    ''', (user_id, _iso_date(date))).fetchone()
+    conn.close()
+    return row[0] if row else 0.0
+
+def get_balance_series(user_id, start_date=None, end_date=None):
+    """Daily closing net cash position over a date range
+    
+    Reads only the index rows inside the range plus the opening balance, and
+    fills days without transactions forward.
+    """
+    conn = sqlite3.connect(DB_FILE)
+    query = 'SELECT date, balance FROM daily_balances WHERE user_id = ?'
+    params = [user_id]
+    if start_date:
+        query += ' AND date >= ?'
+        params.append(_iso_date(start_date))
+    if end_date:
+        query += ' AND date <= ?'
+        params.append(_iso_date(end_date))
+    
+    df = pd.read_sql_query(query + ' ORDER BY date', conn, params=params)
+    conn.close()
+    
+    if df.empty and not start_date:
+        return df
+    
+    df['date'] = pd.to_datetime(df['date'])
+    start = pd.Timestamp(start_date) if start_date else df['date'].min()
+    end = pd.Timestamp(end_date) if end_date else df['date'].max()
+    opening = get_balance_at(user_id, start - pd.Timedelta(days=1)) if start_date else 0.0
+    
+    days = pd.date_range(start, end, freq='D')
+    balance = df.set_index('date')['balance'].reindex(days).ffill().fillna(opening)
+    return pd.DataFrame({'date': days, 'balance': balance.values})
+
+def _blob_path(digest):
+    """On-disk location of a blob, fanned out by the first hash byte"""
+    return os.path.join(ATTACHMENT_DIR, 'blobs', digest[:2], digest)
+
+def _thumbnail_path(digest, size):
+    """On-disk location of a cached thumbnail"""
+    return os.path.join(ATTACHMENT_DIR, 'thumbs', f'{digest}_{size}.png')
+
+def store_blob(stream):
+    """Stream a file-like object into the blob store
+    
+    The bytes are hashed while they are written to a temporary file, which
+    then becomes the blob unless identical content is already stored.
+    Returns the SHA-256 hex digest and size.
+    """
+    os.makedirs(ATTACHMENT_DIR, exist_ok=True)
+    sha256 = hashlib.sha256()
+    size = 0
+    
+    fd, tmp_path = tempfile.mkstemp(dir=ATTACHMENT_DIR, suffix='.part')
+    with os.fdopen(fd, 'wb') as tmp:
+        for chunk in iter(lambda: stream.read(BLOB_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+            tmp.write(chunk)
+            size += len(chunk)
+    
+    digest = sha256.hexdigest()
+    path = _blob_path(digest)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    
+    return digest, size
+
+def open_blob(digest):
+    """Memory-map a stored blob read-only (close it when done)"""
+    with open(_blob_path(digest), 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def read_blob(digest):
+    """Full contents of a stored blob, for downloads"""
+    return Path(_blob_path(digest)).read_bytes()
+
+def get_thumbnail(digest, size=THUMBNAIL_SIZE):
+    """Path to a cached thumbnail of an image blob, generated on first use
+    
+    Returns None for blobs that are not images (e.g. PDF receipts).
+    """
+    path = _thumbnail_path(digest, size)
+    if os.path.exists(path):
+        return path
+    
+    # Empty files can't be memory-mapped
+    try:
+        blob = open_blob(digest)
+    except (OSError, ValueError):
+        return None
+    try:
+        with Image.open(blob) as image:
+            image.thumbnail((size, size))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+            with os.fdopen(fd, 'wb') as tmp:
+                image.save(tmp, format='PNG')
+            os.replace(tmp_path, path)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    finally:
+        blob.close()
+    
+    return path
+
+def add_attachment(user_id, transaction_id, uploaded_file):
+    """Attach an uploaded receipt to a transaction
+    
+    Returns the blob digest, or None for an empty file, which is not stored.
+    """
+    uploaded_file.seek(0)
+    if not uploaded_file.read(1):
+        return None
+    uploaded_file.seek(0)
+    digest, size = store_blob(uploaded_file)
+    
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    cursor.execute('''
+        INSERT INTO attachments (transaction_id, user_id, sha256, filename, mime_type, size)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (transaction_id, user_id, digest, uploaded_file.name, uploaded_file.type, size))
+    
+    # Another session may have removed the blob as unreferenced after it was
+    # stored; it can't again once this row commits
+    if not os.path.exists(_blob_path(digest)):
+        uploaded_file.seek(0)
+        store_blob(uploaded_file)
+    conn.commit()
+    conn.close()
+    
+    return digest
+
+def get_attachments(transaction_id):
+    """Get attachment metadata for a transaction (no file bytes)"""
+    conn = sqlite3.connect(DB_FILE)
+    df = pd.read_sql_query(
+        '''
+            SELECT id, sha256, filename, mime_type, size, created_at
+            FROM attachments WHERE transaction_id = ?
+            ORDER BY id
+        ''',
+        conn,
+        params=(transaction_id,)
+    )
+    conn.close()
+    return df
+
+def delete_attachment(attachment_id):
+    """Delete an attachment, removing its blob once nothing references it"""
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    cursor.execute('SELECT sha256 FROM attachments WHERE id = ?', (attachment_id,))
+    digests = [row[0] for row in cursor.fetchall()]
+    cursor.execute('DELETE FROM attachments WHERE id = ?', (attachment_id,))
+    conn.commit()
+    _remove_unreferenced_blobs(conn, digests)
+    conn.close()
+
+def _delete_attachments(cursor, transaction_ids):
+    """Delete the attachment rows of deleted transactions, returning their digests"""
+    placeholders = ', '.join('?' for _ in transaction_ids)
+    if not placeholders:
+        return []
+    cursor.execute(f'SELECT DISTINCT sha256 FROM attachments WHERE transaction_id IN ({placeholders})', transaction_ids)
+    digests = [row[0] for row in cursor.fetchall()]
+    cursor.execute(f'DELETE FROM attachments WHERE transaction_id IN ({placeholders})', transaction_ids)
+    return digests
+
+def _remove_unreferenced_blobs(conn, digests):
+    """Remove blobs (and their thumbnails) that no attachment references
+    
+    References are checked under the write lock, so an attachment row can't
+    be added for a blob between the check and the removal.
+    """
+    if not digests:
+        return
+    
+    conn.execute('BEGIN IMMEDIATE')
+    for digest in digests:
+        if conn.execute('SELECT 1 FROM attachments WHERE sha256 = ? LIMIT 1', (digest,)).fetchone():
+            continue
+        for path in [_blob_path(digest)] + [str(p) for p in Path(ATTACHMENT_DIR, 'thumbs').glob(f'{digest}_*')]:
+            if os.path.exists(path):
+                os.remove(path)
+    conn.commit()
+
+def get_category_rules(user_id):
+    """Get auto-categorization rules in matching order"""
+    conn = sqlite3.connect(DB_FILE)
+    df = pd.read_sql_query(
+        '''
+            SELECT r.id, r.category_id, c.name as category, r.priority, r.vendor_keyword,
+                   r.pattern, r.min_amount, r.max_amount, r.payment_method
+            FROM category_rules r
+            JOIN categories c ON r.category_id = c.id
+            WHERE r.user_id = ?
+            ORDER BY r.priority DESC, r.id
+        ''',
+        conn,
+        params=(user_id,)
+    )
+    conn.close()
+    return df
+
+def add_category_rule(user_id, category_id, vendor_keyword=None, pattern=None,
+                      min_amount=None, max_amount=None, payment_method=None, priority=0):
+    """Add auto-categorization rule, returning False for an invalid pattern"""
+    if pattern:
+        try:
+            re.compile(pattern)
+        except re.error:
+            return False
+    
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO category_rules
+        (user_id, category_id, priority, vendor_keyword, pattern, min_amount, max_amount, payment_method)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (user_id, int(category_id), priority, vendor_keyword or None, pattern or None,
+          min_amount, max_amount, payment_method or None))
+    conn.commit()
+    conn.close()
+    return True
+
+def delete_category_rule(rule_id):
+    """Delete auto-categorization rule"""
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM category_rules WHERE id = ?', (rule_id,))
+    conn.commit()
+    conn.close()
+
+def compile_category_rules(rules):
+    """Compile rules into a batch matcher
+    
+    The matcher takes a DataFrame with vendor_client, notes, amount and
+    payment_method columns and returns an array of category ids (NaN where
+    no rule matches); the first rule in `rules` order that matches wins.
+    Keyword and regex conditions are evaluated once per distinct
+    vendor/notes text, and amount and payment method conditions only on the
+    rows whose text matched, so large imports with repeated vendors stay
+    cheap.
+    """
+    def text_condition(value):
+        return value if isinstance(value, str) and value else None
+    
+    compiled = []
+    for _, rule in rules.iterrows():
+        keyword = text_condition(rule['vendor_keyword'])
+        pattern = text_condition(rule['pattern'])
+        compiled.append((
+            keyword.lower() if keyword else None,
+            re.compile(pattern, re.IGNORECASE) if pattern else None,
+            rule['min_amount'] if pd.notna(rule['min_amount']) else None,
+            rule['max_amount'] if pd.notna(rule['max_amount']) else None,
+            text_condition(rule['payment_method']),
+            float(rule['category_id'])
+        ))
+    
+    def match(df):
+        result = np.full(len(df), np.nan)
+        if not compiled or df.empty:
+            return result
+        
+        # Distinct (vendor, notes) pairs, and the rows of each pair in order
+        vendor_codes, vendors = pd.factorize(df['vendor_client'].fillna('').astype(str))
+        note_codes, notes = pd.factorize(df['notes'].fillna('').astype(str))
+        codes, pairs = pd.factorize(vendor_codes.astype(np.int64) * max(len(notes), 1) + note_codes)
+        texts = pd.Series(
+            np.asarray(vendors)[pairs // max(len(notes), 1)] + ' ' + np.asarray(notes)[pairs % max(len(notes), 1)]
+        ).str.lower()
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes, minlength=len(texts))
+        starts = np.cumsum(counts) - counts
+        
+        def rows_for(text_mask):
+            selected = np.flatnonzero(text_mask)
+            n = counts[selected]
+            offsets = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+            return order[np.repeat(starts[selected], n) + offsets]
+        
+        amounts = pd.to_numeric(df['amount'], errors='coerce').to_numpy(dtype=float)
+        methods = df['payment_method'].fillna('').to_numpy(dtype=object)
+        all_rows = np.arange(len(df))
+        
+        # Later rules are written first so earlier (higher priority) ones win
+        for keyword, pattern, min_amount, max_amount, method, category_id in reversed(compiled):
+            if keyword or pattern:
+                text_mask = np.ones(len(texts), dtype=bool)
+                if keyword:
+                    text_mask &= texts.str.contains(keyword, regex=False).to_numpy()
+                if pattern:
+                    text_mask &= texts.str.contains(pattern, regex=True).to_numpy()
+                rows = rows_for(text_mask)
+            else:
+                rows = all_rows
+            
+            if min_amount is not None:
+                rows = rows[amounts[rows] >= min_amount]
+            if max_amount is not None:
+                rows = rows[amounts[rows] <= max_amount]
+            if method:
+                rows = rows[methods[rows] == method]
+            result[rows] = category_id
+        
+        return result
+    
+    return match
+
+def categorize_transaction(user_id, amount, vendor, payment_method, notes):
+    """Category id the user's rules assign to a single transaction, or None"""
+    rules = get_category_rules(user_id)
+    if rules.empty:
+        return None
+    
+    row = pd.DataFrame([{'vendor_client': vendor, 'notes': notes, 'amount': amount, 'payment_method': payment_method}])
+    category_id = compile_category_rules(rules)(row)[0]
+    return None if np.isnan(category_id) else int(category_id)
 
-def add_transaction(user_id, trans_type, amount, date, vendor, category_id, payment_method, notes, is_reimbursed):
-    """Add new transaction"""
+def _categorize_rows(user_id, rows):
+    """Fill in rule-based categories for EDITABLE_FIELDS rows that have none"""
+    position = EDITABLE_FIELDS.index('category_id')
+    uncategorized = [i for i, row in enumerate(rows) if row[position] is None]
+    rules = get_category_rules(user_id) if uncategorized else pd.DataFrame()
+    if rules.empty:
+        return rows
+    
+    df = pd.DataFrame([rows[i] for i in uncategorized], columns=EDITABLE_FIELDS)
+    matched = compile_category_rules(rules)(df)
+    
+    rows = list(rows)
+    for i, category_id in zip(uncategorized, matched):
+        if not np.isnan(category_id):
+            rows[i] = rows[i][:position] + (int(category_id),) + rows[i][position + 1:]
+    return rows
+
+def backfill_categories(user_id):
+    """Categorize the user's uncategorized transactions with their rules
+    
+    Only the live table is updated; archived years stay as they were.
+    Returns the number of transactions that were categorized.
+    """
+    rules = get_category_rules(user_id)
+    if rules.empty:
+        return 0
+    
     conn = sqlite3.connect(DB_FILE)
+    df = pd.read_sql_query(
+        '''
+            SELECT id, amount, vendor_client, payment_method, notes
+            FROM transactions
+            WHERE user_id = ? AND category_id IS NULL
+        ''',
+        conn,
+        params=(user_id,)
+    )
+    
+    matched = compile_category_rules(rules)(df)
+    found = ~np.isnan(matched)
+    updates = list(zip(matched[found].astype(int).tolist(), df['id'][found].tolist()))
+    
     cursor = conn.cursor()
+    # Under the write lock, only rows still uncategorized and still there change
+    cursor.execute('BEGIN IMMEDIATE')
+    removed = [
+        row for row in _fetch_transactions(cursor, [transaction_id for _, transaction_id in updates], user_id)
+        if row['category_id'] is None
+    ]
+    category_ids = {transaction_id: category_id for category_id, transaction_id in updates}
+    cursor.executemany(
+        'UPDATE transactions SET category_id = ? WHERE id = ?',
+        [(category_ids[row['id']], row['id']) for row in removed]
+    )
     
-    cursor.execute('''
-        INSERT INTO transactions 
-        (user_id, type, amount, date, vendor_client, category_id, payment_method, notes, is_reimbursed)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (user_id, trans_type, amount, date, vendor, category_id, payment_method, notes, is_reimbursed))
+    added = [dict(row, category_id=category_ids[row['id']]) for row in removed]
+    _apply_transaction_effects(cursor, removed=removed, added=added)
     
     conn.commit()
     conn.close()
+    return len(removed)
 
-def get_transactions(user_id, filters=None):
-    """Get transactions with optional filters"""
+def get_category_usage(user_id):
+    """Transaction count and total amount per category, from the running counters"""
     conn = sqlite3.connect(DB_FILE)
+    df = pd.read_sql_query(
+        '''
+            SELECT category_id, SUM(count) as count, SUM(total) as total
+            FROM category_spend
+            WHERE user_id = ?
+            GROUP BY category_id
+        ''',
+        conn,
+        params=(user_id,)
+    )
+    conn.close()
+    return df
+
+def get_category_budgets(user_id, month=None):
+    """Budgeted categories with this month's spend and utilization
     
-    query = '''
-        SELECT 
-            t.id, t.type, t.amount, t.date, t.vendor_client,
-            c.name as category, c.color as category_color,
-            t.payment_method, t.notes, t.is_reimbursed
-        FROM transactions t
-        LEFT JOIN categories c ON t.category_id = c.id
-        WHERE t.user_id = ?
-    '''
-    params = [user_id]
-    
-    if filters:
-        if filters.get('type'):
-            query += ' AND t.type = ?'
-            params.append(filters['type'])
-        if filters.get('start_date'):
-            query += ' AND t.date >= ?'
-            params.append(filters['start_date'])
-        if filters.get('end_date'):
-            query += ' AND t.date <= ?'
-            params.append(filters['end_date'])
-        if filters.get('category'):
-            query += ' AND c.name = ?'
-            params.append(filters['category'])
-    
-    query += ' ORDER BY t.date DESC, t.created_at DESC'
-    
-    df = pd.read_sql_query(query, conn, params=params)
+    Reads one counter row per budgeted category, so the cost does not grow
+    with the number of transactions.
+    """
+    month = month or datetime.now().strftime('%Y-%m')
+    conn = sqlite3.connect(DB_FILE)
+    df = pd.read_sql_query(
+        '''
+            SELECT c.id as category_id, c.name as category, c.color,
+                   b.monthly_budget as budget, COALESCE(s.spent, 0) as spent
+            FROM category_budgets b
+            JOIN categories c ON c.id = b.category_id
+            LEFT JOIN category_spend s
+                ON s.user_id = b.user_id AND s.category_id = b.category_id AND s.month = ?
+            WHERE b.user_id = ?
+            ORDER BY c.name
+        ''',
+        conn,
+        params=(month, user_id)
+    )
     conn.close()
+    
+    df['utilization'] = df['spent'] / df['budget']
     return df
 
-def delete_transaction(transaction_id):
-    """Delete a transaction"""
+def set_category_budget(user_id, category_id, monthly_budget):
+    """Set a category's monthly budget; an empty or zero budget removes it"""
     conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM transactions WHERE id = ?', (transaction_id,))
+    if monthly_budget:
+        conn.execute(
+            'INSERT OR REPLACE INTO category_budgets (user_id, category_id, monthly_budget) VALUES (?, ?, ?)',
+            (user_id, int(category_id), float(monthly_budget))
+        )
+    else:
+        conn.execute(
+            'DELETE FROM category_budgets WHERE user_id = ? AND category_id = ?',
+            (user_id, int(category_id))
+        )
     conn.commit()
     conn.close()
 
+def budget_alerts(budgets):
+    """Over-budget and close-to-budget messages as (level, text) pairs"""
+    alerts = []
+    for _, budget in budgets.iterrows():
+        if budget['utilization'] > 1:
+            alerts.append(('error', f"🚨 {budget['category']} is over budget: ${budget['spent']:,.2f} of ${budget['budget']:,.2f}"))
+        elif budget['utilization'] >= BUDGET_WARNING_RATIO:
+            alerts.append(('warning', f"⚠️ {budget['category']} has used {budget['utilization']:.0%} of its ${budget['budget']:,.2f} budget"))
+    return alerts
+
 def get_dashboard_data(user_id, start_date=None, end_date=None):
     """Get dashboard summary data"""
-    conn = sqlite3.connect(DB_FILE)
+    conn, source = open_transactions(start_date, end_date)
     
-    query = '''
+    query = f'''
         SELECT 
             type,
             SUM(amount) as total,
             COUNT(*) as count
-        FROM transactions
+        FROM {source}
         WHERE user_id = ?
     '''
     params = [user_id]
@@ -253,15 +1764,15 @@ def get_dashboard_data(user_id, start_date=None, end_date=None):
 
 def get_category_breakdown(user_id, start_date=None, end_date=None):
     """Get spending by category"""
-    conn = sqlite3.connect(DB_FILE)
+    conn, source = open_transactions(start_date, end_date)
     
-    query = '''
+    query = f'''
         SELECT 
             c.name as category,
             c.color,
             SUM(t.amount) as total,
             COUNT(*) as count
-        FROM transactions t
+        FROM {source} t
         LEFT JOIN categories c ON t.category_id = c.id
         WHERE t.user_id = ? AND t.type IN ('purchase', 'expense')
     '''
@@ -282,24 +1793,154 @@ def get_category_breakdown(user_id, start_date=None, end_date=None):
 
 def get_monthly_breakdown(user_id):
     """Get monthly income vs expenses"""
+    def query_months(conn, source):
+        query = f'''
+            SELECT 
+                strftime('%Y-%m', date) as month,
+                SUM(CASE WHEN type = 'credit' THEN amount ELSE 0 END) as income,
+                SUM(CASE WHEN type IN ('purchase', 'expense') THEN amount ELSE 0 END) as expenses
+            FROM {source}
+            WHERE user_id = ?
+            GROUP BY strftime('%Y-%m', date)
+            ORDER BY month DESC
+            LIMIT 12
+        '''
+        return pd.read_sql_query(query, conn, params=(user_id,))
+    
+    # The live table alone answers the question unless fewer than 12 months
+    # remain in it or an archived year could still rank among the latest 12
     conn = sqlite3.connect(DB_FILE)
+    df = query_months(conn, 'transactions')
+    last_archived = conn.execute('SELECT MAX(year) FROM archived_years').fetchone()[0]
+    conn.close()
     
-    query = '''
-        SELECT 
-            strftime('%Y-%m', date) as month,
-            SUM(CASE WHEN type = 'credit' THEN amount ELSE 0 END) as income,
-            SUM(CASE WHEN type IN ('purchase', 'expense') THEN amount ELSE 0 END) as expenses
-        FROM transactions
-        WHERE user_id = ?
-        GROUP BY strftime('%Y-%m', date)
-        ORDER BY month DESC
-        LIMIT 12
+    if last_archived is not None and (len(df) < 12 or df['month'].min() <= f'{last_archived}-12'):
+        conn, source = open_transactions()
+        df = query_months(conn, source)
+        conn.close()
+    
+    return df
+
+def get_period_comparison(user_id, start_date, end_date, shift_months=None):
+    """Totals for a date range next to the previous period and last year
+    
+    The previous period is the range shifted back by `shift_months` months
+    (month-over-month, quarter-over-quarter, ...) or, without it, the
+    equal-length window right before the range. All three periods come out
+    of one indexed query; archived years are only read when last year's
+    window reaches them.
+    """
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    if shift_months:
+        previous = (start - pd.DateOffset(months=shift_months), end - pd.DateOffset(months=shift_months))
+    else:
+        previous = (start - (end - start) - pd.Timedelta(days=1), start - pd.Timedelta(days=1))
+    last_year = (start - pd.DateOffset(years=1), end - pd.DateOffset(years=1))
+    
+    periods = {'': (start, end), 'prev_': previous, 'yoy_': last_year}
+    bounds = {prefix: (a.date().isoformat(), b.date().isoformat()) for prefix, (a, b) in periods.items()}
+    
+    columns = []
+    params = []
+    for prefix, (a, b) in bounds.items():
+        columns += [
+            f"SUM(CASE WHEN date BETWEEN ? AND ? AND type = 'credit' THEN amount ELSE 0 END) as {prefix}income",
+            f"SUM(CASE WHEN date BETWEEN ? AND ? AND type IN ('purchase', 'expense') THEN amount ELSE 0 END) as {prefix}expenses",
+            f"SUM(CASE WHEN date BETWEEN ? AND ? THEN 1 ELSE 0 END) as {prefix}count"
+        ]
+        params += [a, b] * 3
+    
+    conn, source = open_transactions(min(a for a, _ in bounds.values()), bounds[''][1])
+    query = f'''
+        SELECT {', '.join(columns)}
+        FROM {source}
+        WHERE user_id = ? AND ({' OR '.join('date BETWEEN ? AND ?' for _ in bounds)})
     '''
+    params += [user_id] + [value for a, b in bounds.values() for value in (a, b)]
     
-    df = pd.read_sql_query(query, conn, params=(user_id,))
+    result = pd.read_sql_query(query, conn, params=params).fillna(0).iloc[0]
+    conn.close()
+    
+    for prefix in periods:
+        result[f'{prefix}net'] = result[f'{prefix}income'] - result[f'{prefix}expenses']
+    return result
+
+def get_rolling_category_spend(user_id, start_date, end_date, windows=ROLLING_WINDOWS):
+    """Rolling N-day spend per category for every day in a range
+    
+    A dense day-by-category grid is built in SQL (so every window frame is
+    exactly N days) and summed with window functions.
+    """
+    lookback = max(windows) - 1
+    window_start = (pd.Timestamp(start_date) - pd.Timedelta(days=lookback)).date().isoformat()
+    end = pd.Timestamp(end_date).date().isoformat()
+    
+    conn, source = open_transactions(window_start, end)
+    rolling = ',\n'.join(
+        f'''SUM(spend) OVER (
+                    PARTITION BY category_id ORDER BY day
+                    ROWS BETWEEN {window - 1} PRECEDING AND CURRENT ROW
+                ) as rolling_{window}'''
+        for window in windows
+    )
+    query = f'''
+        WITH RECURSIVE days(day) AS (
+            SELECT date(?)
+            UNION ALL
+            SELECT date(day, '+1 day') FROM days WHERE day < date(?)
+        ),
+        daily AS (
+            SELECT category_id, date(date) as day, SUM(amount) as spend
+            FROM {source}
+            WHERE user_id = ? AND type IN ('purchase', 'expense') AND date BETWEEN ? AND ?
+            GROUP BY category_id, date(date)
+        ),
+        grid AS (
+            SELECT k.category_id, d.day, COALESCE(s.spend, 0) as spend
+            FROM (SELECT DISTINCT category_id FROM daily) k
+            CROSS JOIN days d
+            LEFT JOIN daily s ON s.category_id IS k.category_id AND s.day = d.day
+        ),
+        rolled AS (
+            SELECT category_id, day, spend,
+                {rolling}
+            FROM grid
+        )
+        SELECT COALESCE(c.name, 'Uncategorized') as category, c.color, r.*
+        FROM rolled r
+        LEFT JOIN categories c ON r.category_id = c.id
+        WHERE r.day >= date(?)
+        ORDER BY category, r.day
+    '''
+    params = (window_start, end, user_id, window_start, end, pd.Timestamp(start_date).date().isoformat())
+    
+    df = pd.read_sql_query(query, conn, params=params)
     conn.close()
     return df
 
+def comparison_metric_args(comparison, key, label):
+    """st.metric delta and help text comparing a period total"""
+    if comparison is None:
+        return {}
+    
+    last_year = comparison[f'yoy_{key}']
+    return {
+        'delta': format_change(comparison[key], comparison[f'prev_{key}']),
+        'delta_color': 'inverse' if key == 'expenses' else 'normal',
+        'help': (
+            f"Change {label}. Same period last year: ${last_year:,.2f} "
+            f"({format_change(comparison[key], last_year)})"
+        )
+    }
+
+def format_change(current, previous):
+    """Metric delta text for a change between two periods"""
+    change = current - previous
+    sign = '+' if change >= 0 else '-'
+    if previous:
+        return f"{sign}${abs(change):,.2f} ({sign}{abs(change) / abs(previous):.0%})"
+    return f"{sign}${abs(change):,.2f}"
+
 def add_credit(user_id, client_name, amount, due_date, notes):
     """Add credit/invoice tracking"""
     conn = sqlite3.connect(DB_FILE)
@@ -313,38 +1954,133 @@ def add_credit(user_id, client_name, amount, due_date, notes):
     conn.commit()
     conn.close()
 
-def get_credits(user_id, status_filter=None):
-    """Get credits with optional status filter"""
+def mark_overdue_credits(user_id):
+    """Mark the user's pending credits past their due date as overdue
+    
+    Checks first with a read, so the usual case where nothing is newly
+    overdue takes no write lock. Returns the number of credits updated.
+    """
+    conn = sqlite3.connect(DB_FILE)
+    params = (user_id, datetime.now().date())
+    overdue = conn.execute(
+        "SELECT EXISTS (SELECT 1 FROM credits_tracking WHERE user_id = ? AND status = 'pending' AND due_date < ?)",
+        params
+    ).fetchone()[0]
+    
+    updated = 0
+    if overdue:
+        cursor = conn.execute(
+            "UPDATE credits_tracking SET status = 'overdue' WHERE user_id = ? AND status = 'pending' AND due_date < ?",
+            params
+        )
+        updated = cursor.rowcount
+        conn.commit()
+    
+    conn.close()
+    return updated
+
+def get_credits(user_id, status_filter=None, columns=None, compact=False, limit=None, offset=0):
+    """Get credits with optional status filter
+    
+    `columns` limits the result to a subset of CREDIT_FIELDS and `compact`
+    returns compact dtypes. `limit` and `offset` return a single page.
+    Statuses are as stored; call mark_overdue_credits first for current ones.
+    """
     conn = sqlite3.connect(DB_FILE)
     
-    query = 'SELECT * FROM credits_tracking WHERE user_id = ?'
+    columns = [column for column in (columns or CREDIT_FIELDS) if column in CREDIT_FIELDS]
+    query = f"SELECT {', '.join(columns)} FROM credits_tracking WHERE user_id = ?"
     params = [user_id]
     
     if status_filter:
         query += ' AND status = ?'
         params.append(status_filter)
     
-    query += ' ORDER BY due_date'
+    query += ' ORDER BY due_date, id'
+    if limit:
+        query += ' LIMIT ? OFFSET ?'
+        params += [limit, offset]
     
     df = pd.read_sql_query(query, conn, params=params)
     conn.close()
     
-    # Update overdue status
-    if not df.empty:
-        today = datetime.now().date()
-        overdue_mask = (df['status'] == 'pending') & (pd.to_datetime(df['due_date']).dt.date < today)
-        if overdue_mask.any():
-            conn = sqlite3.connect(DB_FILE)
-            cursor = conn.cursor()
-            for idx in df[overdue_mask].index:
-                cursor.execute(
-                    "UPDATE credits_tracking SET status = 'overdue' WHERE id = ?",
-                    (df.loc[idx, 'id'],)
-                )
-            conn.commit()
-            conn.close()
-            df.loc[overdue_mask, 'status'] = 'overdue'
+    return compact_dtypes(df) if compact else df
+
+def count_credits(user_id, status_filter=None):
+    """Count credits with optional status filter"""
+    conn = sqlite3.connect(DB_FILE)
+    query = 'SELECT COUNT(*) FROM credits_tracking WHERE user_id = ?'
+    params = [user_id]
     
+    if status_filter:
+        query += ' AND status = ?'
+        params.append(status_filter)
+    
+    count = conn.execute(query, params).fetchone()[0]
+    conn.close()
+    return count
+
+def _aging_columns():
+    """SUM(...) select list splitting open invoice amounts into aging buckets"""
+    columns = []
+    for column, _, min_days, max_days in AGING_BUCKETS:
+        if min_days is None:
+            condition = f'COALESCE(days_late, 0) <= {max_days}'
+        elif max_days is None:
+            condition = f'days_late >= {min_days}'
+        else:
+            condition = f'days_late BETWEEN {min_days} AND {max_days}'
+        columns.append(f"SUM(CASE WHEN status != 'paid' AND {condition} THEN amount ELSE 0 END) as {column}")
+    return ',\n            '.join(columns)
+
+def get_credit_summary(user_id):
+    """Status totals and accounts-receivable aging in one pass over the index
+    
+    Open invoices past their due date count as overdue whether or not their
+    status has been updated yet.
+    """
+    conn = sqlite3.connect(DB_FILE)
+    query = f'''
+        SELECT
+            COUNT(*) as invoices,
+            SUM(CASE WHEN status != 'paid' AND COALESCE(days_late, 0) <= 0 THEN amount ELSE 0 END) as pending,
+            SUM(CASE WHEN status = 'paid' THEN amount ELSE 0 END) as paid,
+            SUM(CASE WHEN status != 'paid' AND days_late > 0 THEN amount ELSE 0 END) as overdue,
+            {_aging_columns()}
+        FROM (
+            SELECT status, amount, due_date,
+                   CAST(julianday(?) - julianday(due_date) AS INTEGER) as days_late
+            FROM credits_tracking
+            WHERE user_id = ?
+        )
+    '''
+    df = pd.read_sql_query(query, conn, params=(datetime.now().date(), user_id))
+    conn.close()
+    return df.fillna(0).iloc[0]
+
+def get_client_balances(user_id, limit=10):
+    """Outstanding balance per client with aging, most overdue first"""
+    conn = sqlite3.connect(DB_FILE)
+    query = f'''
+        SELECT
+            client_name,
+            COUNT(*) as invoices,
+            SUM(amount) as outstanding,
+            SUM(CASE WHEN days_late > 0 THEN amount ELSE 0 END) as overdue,
+            MIN(due_date) as oldest_due,
+            {_aging_columns()}
+        FROM (
+            SELECT client_name, status, amount, due_date,
+                   CAST(julianday(?) - julianday(due_date) AS INTEGER) as days_late
+            FROM credits_tracking
+            WHERE user_id = ? AND status IN ('pending', 'overdue')
+        )
+        GROUP BY client_name
+        ORDER BY overdue DESC, outstanding DESC
+        LIMIT ?
+    '''
+    df = pd.read_sql_query(query, conn, params=(datetime.now().date(), user_id, limit))
+    conn.close()
     return df
 
 def mark_credit_paid(credit_id):
@@ -358,6 +2094,116 @@ def mark_credit_paid(credit_id):
     conn.commit()
     conn.close()
 
+def expand_schedules(start_dates, frequencies, today, horizon):
+    """Expand recurring schedules into their occurrences in [today, horizon]
+    
+    Returns (schedule index, occurrence date) arrays. Every schedule is
+    expanded at once with numpy date arithmetic; monthly steps keep the
+    schedule's day of month, clamped to the length of shorter months.
+    """
+    start = np.asarray(start_dates, dtype='datetime64[D]')
+    steps = np.array([FREQUENCY_STEPS[f] for f in frequencies], dtype=np.int64).reshape(-1, 2)
+    step_days, step_months = steps[:, 0], steps[:, 1]
+    by_month = step_months > 0
+    today, horizon = np.datetime64(today, 'D'), np.datetime64(horizon, 'D')
+    
+    # Position of each day-based schedule in days, month-based in months
+    start_month = start.astype('datetime64[M]')
+    offset_now = np.where(
+        by_month,
+        (today.astype('datetime64[M]') - start_month).astype(np.int64),
+        (today - start).astype(np.int64)
+    )
+    offset_end = np.where(
+        by_month,
+        (horizon.astype('datetime64[M]') - start_month).astype(np.int64),
+        (horizon - start).astype(np.int64)
+    )
+    step = np.where(by_month, step_months, step_days)
+    
+    # First step at or just before today, last step at or before the horizon
+    first = np.maximum(offset_now // step, 0)
+    last = offset_end // step
+    counts = np.maximum(last - first + 1, 0)
+    
+    schedule = np.repeat(np.arange(len(start)), counts)
+    k = first[schedule] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    
+    # Day-based dates are a plain offset; month-based ones clamp the day
+    month = start_month[schedule] + (k * step_months[schedule]).astype('timedelta64[M]')
+    month_start = month.astype('datetime64[D]')
+    month_length = ((month + 1).astype('datetime64[D]') - month_start).astype(np.int64)
+    day = (start[schedule] - start_month[schedule].astype('datetime64[D]')).astype(np.int64)
+    dates = np.where(
+        by_month[schedule],
+        month_start + np.minimum(day, month_length - 1).astype('timedelta64[D]'),
+        start[schedule] + (k * step_days[schedule]).astype('timedelta64[D]')
+    )
+    
+    keep = (dates >= today) & (dates <= horizon)
+    return schedule[keep], dates[keep]
+
+@st.cache_data(show_spinner=False, max_entries=FORECAST_CACHE_ENTRIES, ttl=FORECAST_CACHE_TTL)
+def _cash_flow_forecast(user_id, months, today, data_version):
+    """Forecast for one data version (see get_cash_flow_forecast)"""
+    horizon = (pd.Timestamp(today) + pd.DateOffset(months=months)).date()
+    
+    conn = sqlite3.connect(DB_FILE)
+    recurring = pd.read_sql_query(
+        '''
+            SELECT type, amount, frequency, next_due_date
+            FROM recurring_transactions
+            WHERE user_id = ? AND is_active = 1
+        ''',
+        conn,
+        params=(user_id,)
+    )
+    receivables = pd.read_sql_query(
+        '''
+            SELECT amount, due_date
+            FROM credits_tracking
+            WHERE user_id = ? AND status IN ('pending', 'overdue') AND due_date IS NOT NULL
+        ''',
+        conn,
+        params=(user_id,)
+    )
+    conn.close()
+    
+    schedule, dates = expand_schedules(
+        pd.to_datetime(recurring['next_due_date'], format='ISO8601').values.astype('datetime64[D]'),
+        recurring['frequency'].tolist(),
+        today,
+        horizon
+    )
+    signed = np.where(recurring['type'] == 'credit', 1.0, -1.0) * recurring['amount'].to_numpy(dtype=float)
+    flows = pd.DataFrame({'date': dates, 'amount': signed[schedule]})
+    
+    # Open invoices land on their due date; overdue ones are expected today
+    due = pd.to_datetime(receivables['due_date'], format='ISO8601').values.astype('datetime64[D]')
+    due = np.maximum(due, np.datetime64(today, 'D'))
+    invoices = pd.DataFrame({'date': due, 'amount': receivables['amount'].to_numpy(dtype=float)})
+    flows = pd.concat([flows, invoices[invoices['date'] <= np.datetime64(horizon, 'D')]], ignore_index=True)
+    
+    days = pd.date_range(today, horizon, freq='D')
+    flows['date'] = pd.to_datetime(flows['date'])
+    inflow = flows[flows['amount'] > 0].groupby('date')['amount'].sum().reindex(days, fill_value=0.0)
+    outflow = -flows[flows['amount'] < 0].groupby('date')['amount'].sum().reindex(days, fill_value=0.0)
+    
+    forecast = pd.DataFrame({'date': days, 'inflow': inflow.values, 'outflow': outflow.values})
+    forecast['net'] = forecast['inflow'] - forecast['outflow']
+    forecast['cumulative'] = forecast['net'].cumsum()
+    return forecast
+
+def get_cash_flow_forecast(user_id, months=3):
+    """Projected daily cash flow over the next `months` months
+    
+    Expands every active recurring schedule and every open invoice into
+    daily inflow, outflow, net and cumulative net columns. Results are cached
+    per change log version, so they are recomputed only after the user's
+    data changes.
+    """
+    return _cash_flow_forecast(user_id, months, datetime.now().date(), get_change_version(user_id))
+
 # Initialize session state
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
@@ -478,29 +2324,61 @@ def show_dashboard():
         end_date = datetime.now().date()
     
     # Get data
-    summary = get_dashboard_data(st.session_state.user_id, start_date, end_date)
-    
-    # Calculate totals
-    total_income = summary[summary['type'] == 'credit']['total'].sum() if 'credit' in summary['type'].values else 0
-    total_expenses = summary[summary['type'].isin(['purchase', 'expense'])]['total'].sum()
-    net_profit = total_income - total_expenses
-    total_transactions = summary['count'].sum()
+    comparison = None
+    if start_date:
+        # Totals for the period, the previous period and last year in one query
+        comparison = get_period_comparison(st.session_state.user_id, start_date, end_date, PERIOD_SHIFTS[period])
+        total_income = comparison['income']
+        total_expenses = comparison['expenses']
+        net_profit = comparison['net']
+        total_transactions = comparison['count']
+        compare_label = f"vs {period.replace('This', 'last').lower()}"
+    else:
+        summary = get_dashboard_data(st.session_state.user_id, start_date, end_date)
+        
+        # Calculate totals
+        total_income = summary[summary['type'] == 'credit']['total'].sum() if 'credit' in summary['type'].values else 0
+        total_expenses = summary[summary['type'].isin(['purchase', 'expense'])]['total'].sum()
+        net_profit = total_income - total_expenses
+        total_transactions = summary['count'].sum()
+        compare_label = None
     
     # Summary cards
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("💚 Total Income", f"${total_income:,.2f}")
+        st.metric("💚 Total Income", f"${total_income:,.2f}", **comparison_metric_args(comparison, 'income', compare_label))
     with col2:
-        st.metric("💸 Total Expenses", f"${total_expenses:,.2f}")
+        st.metric("💸 Total Expenses", f"${total_expenses:,.2f}", **comparison_metric_args(comparison, 'expenses', compare_label))
     with col3:
+        if comparison is not None:
+            st.metric("💰 Net Profit/Loss", f"${net_profit:,.2f}", **comparison_metric_args(comparison, 'net', compare_label))
+        else:
+            st.metric(
+                "💰 Net Profit/Loss", 
+                f"${net_profit:,.2f}",
+                delta=f"${net_profit:,.2f}" if net_profit >= 0 else f"-${abs(net_profit):,.2f}"
+            )
+    with col4:
         st.metric(
-            "💰 Net Profit/Loss", 
-            f"${net_profit:,.2f}",
-            delta=f"${net_profit:,.2f}" if net_profit >= 0 else f"-${abs(net_profit):,.2f}"
+            "📝 Transactions",
+            int(total_transactions),
+            delta=int(total_transactions - comparison['prev_count']) if comparison is not None else None
         )
-    with col4:
-        st.metric("📝 Transactions", int(total_transactions))
+    
+    # Budgets
+    budgets = get_category_budgets(st.session_state.user_id)
+    if not budgets.empty:
+        st.subheader("This Month's Budgets")
+        for level, message in budget_alerts(budgets):
+            getattr(st, level)(message)
+        columns = st.columns(4)
+        for idx, budget in budgets.iterrows():
+            with columns[idx % 4]:
+                st.progress(
+                    min(float(budget['utilization']), 1.0),
+                    text=f"{budget['category']}: ${budget['spent']:,.2f} / ${budget['budget']:,.2f}"
+                )
     
     # Charts
     col1, col2 = st.columns(2)
@@ -535,6 +2413,43 @@ def show_dashboard():
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("No expense data available")
+    
+    # Cash position
+    st.subheader("Cumulative Cash Position")
+    balances = get_balance_series(st.session_state.user_id, start_date, end_date)
+    if not balances.empty:
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            name='Net Cash', x=balances['date'], y=balances['balance'],
+            line=dict(color='#3B82F6', shape='hv'), fill='tozeroy'
+        ))
+        fig.update_layout(height=300)
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("No data available")
+    
+    # Forecast
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.subheader("Cash-Flow Forecast")
+    with col2:
+        forecast_months = st.selectbox(
+            "Forecast horizon",
+            FORECAST_MONTHS,
+            format_func=lambda months: f"Next {months} months",
+            label_visibility="collapsed"
+        )
+    
+    forecast = get_cash_flow_forecast(st.session_state.user_id, forecast_months)
+    if forecast['inflow'].any() or forecast['outflow'].any():
+        fig = go.Figure()
+        fig.add_trace(go.Bar(name='Inflow', x=forecast['date'], y=forecast['inflow'], marker_color='#10B981'))
+        fig.add_trace(go.Bar(name='Outflow', x=forecast['date'], y=-forecast['outflow'], marker_color='#EF4444'))
+        fig.add_trace(go.Scatter(name='Cumulative Net', x=forecast['date'], y=forecast['cumulative'], line=dict(color='#3B82F6')))
+        fig.update_layout(barmode='relative', height=350)
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("No recurring transactions or open invoices to forecast")
 
 def show_transactions():
     """Transactions page"""
@@ -559,7 +2474,7 @@ def show_transactions():
             with col3:
                 payment_method = st.selectbox(
                     "Payment Method",
-                    ["", "Credit Card", "Debit Card", "E-transfer", "Cash", "Check", "PayPal", "Bank Transfer"]
+                    [""] + PAYMENT_METHODS
                 )
                 notes = st.text_area("Notes", height=100)
                 is_reimbursed = st.checkbox("Mark as Reimbursed")
@@ -608,56 +2523,198 @@ def show_transactions():
         if end_date:
             filters['end_date'] = end_date
     
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        if st.checkbox("⚠️ Flagged only", help="Likely duplicates and unusual amounts for their vendor and category"):
+            filters['flagged'] = True
+    with col2:
+        if st.button("🔍 Rescan Flags", use_container_width=True):
+            flagged = score_transactions(st.session_state.user_id)
+            st.success(f"Flagged {flagged} transactions")
+    
+    # Paging
+    total_transactions = count_transactions(st.session_state.user_id, filters)
+    col1, col2, col3 = st.columns([1, 1, 2])
+    
+    with col1:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1)
+    
+    page_count = max(1, -(-total_transactions // page_size))
+    with col2:
+        page_no = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+    
+    with col3:
+        bulk_edit = st.toggle("✏️ Bulk edit", help="Edit, add and delete the rows on this page, then save them all at once")
+    
     # Get and display transactions
-    transactions = get_transactions(st.session_state.user_id, filters if filters else None)
+    offset = (page_no - 1) * page_size
+    transactions = get_transactions(
+        st.session_state.user_id,
+        filters if filters else None,
+        limit=page_size,
+        offset=offset
+    )
     
     if not transactions.empty:
+        st.caption(f"Showing {offset + 1}–{offset + len(transactions)} of {total_transactions}")
+        
         # Download button
-        csv = transactions.to_csv(index=False)
-        st.download_button(
-            label="📥 Download CSV",
-            data=csv,
-            file_name=f"transactions_{datetime.now().strftime('%Y%m%d')}.csv",
-            mime="text/csv"
-        )
+        if st.button("📥 Export CSV"):
+            csv = get_transactions(st.session_state.user_id, filters if filters else None).to_csv(index=False)
+            st.download_button(
+                label="📥 Download CSV",
+                data=csv,
+                file_name=f"transactions_{datetime.now().strftime('%Y%m%d')}.csv",
+                mime="text/csv"
+            )
         
-        # Display transactions
-        for idx, row in transactions.iterrows():
-            with st.container():
-                col1, col2, col3, col4, col5, col6 = st.columns([2, 2, 2, 2, 2, 1])
-                
-                with col1:
-                    st.write(f"**{row['date']}**")
-                
-                with col2:
-                    color = {'credit': '🟢', 'expense': '🔴', 'purchase': '🟡'}
-                    st.write(f"{color.get(row['type'], '⚪')} {row['type'].title()}")
-                
-                with col3:
-                    st.write(row['vendor_client'] if pd.notna(row['vendor_client']) else '-')
-                
-                with col4:
-                    if pd.notna(row['category']):
-                        st.markdown(
-                            f"<span style='color: {row['category_color']}'>●</span> {row['category']}",
-                            unsafe_allow_html=True
-                        )
-                    else:
-                        st.write('-')
-                
-                with col5:
-                    amount_color = '#10B981' if row['type'] == 'credit' else '#EF4444'
-                    st.markdown(f"<span style='color: {amount_color}; font-weight: bold'>${row['amount']:,.2f}</span>", unsafe_allow_html=True)
-                
-                with col6:
-                    if st.button("🗑️", key=f"del_{row['id']}"):
-                        delete_transaction(row['id'])
-                        st.rerun()
-                
-                st.divider()
+        if bulk_edit:
+            archived = transactions['archived'].astype(bool)
+            if archived.any():
+                st.info(f"🗄️ {archived.sum()} archived transactions on this page are read-only and left out of the grid.")
+            show_bulk_editor(transactions[~archived], categories)
+        else:
+            # Display transactions
+            for idx, row in transactions.iterrows():
+                with st.container():
+                    col1, col2, col3, col4, col5, col6 = st.columns([2, 2, 2, 2, 2, 1])
+                    
+                    with col1:
+                        st.write(f"**{row['date']}**" + (f" 📎{row['attachments']}" if row['attachments'] else ''))
+                    
+                    with col2:
+                        color = {'credit': '🟢', 'expense': '🔴', 'purchase': '🟡'}
+                        st.write(f"{color.get(row['type'], '⚪')} {row['type'].title()}")
+                    
+                    with col3:
+                        st.write(row['vendor_client'] if pd.notna(row['vendor_client']) else '-')
+                    
+                    with col4:
+                        if pd.notna(row['category']):
+                            st.markdown(
+                                f"<span style='color: {row['category_color']}'>●</span> {row['category']}",
+                                unsafe_allow_html=True
+                            )
+                        else:
+                            st.write('-')
+                    
+                    with col5:
+                        amount_color = '#10B981' if row['type'] == 'credit' else '#EF4444'
+                        st.markdown(f"<span style='color: {amount_color}; font-weight: bold'>${row['amount']:,.2f}</span>", unsafe_allow_html=True)
+                        flags = format_flags(row['duplicate_of'], row['z_score'])
+                        if flags:
+                            st.caption(f"⚠️ {flags}")
+                    
+                    with col6:
+                        if row['archived']:
+                            st.markdown("🗄️", help="Archived transactions are read-only")
+                        elif st.button("🗑️", key=f"del_{row['id']}"):
+                            if delete_transaction(row['id']):
+                                st.rerun()
+                            st.error("Transaction could not be deleted.")
+                    
+                    st.divider()
+            
+            show_receipts(transactions)
     else:
         st.info("No transactions found. Add your first transaction above!")
 
+def show_receipts(transactions):
+    """Receipt attachments for the transactions on the current page
+    
+    The expander reruns the page when it is toggled and its body only runs
+    while it is open, so a closed one costs no file reads. Receipt bytes are
+    only read when a download is clicked.
+    """
+    with st.expander("📎 Receipts", key="receipts", on_change="rerun") as receipts:
+        if not receipts.open:
+            return
+        
+        labels = {
+            row['id']: f"{row['date']} • {row['vendor_client'] or '-'} • ${row['amount']:,.2f}"
+            for _, row in transactions.iterrows()
+        }
+        transaction_id = st.selectbox("Transaction", list(labels), format_func=labels.get, key="receipt_transaction")
+        
+        uploaded = st.file_uploader("Attach receipt", type=ATTACHMENT_TYPES, key=f"receipt_upload_{transaction_id}")
+        if uploaded is not None and st.button("📎 Attach"):
+            if add_attachment(st.session_state.user_id, transaction_id, uploaded):
+                st.success(f"Attached {uploaded.name}")
+                st.rerun()
+            st.error(f"{uploaded.name} is empty")
+        
+        attachments = get_attachments(transaction_id)
+        if attachments.empty:
+            st.caption("No receipts attached.")
+        
+        for _, attachment in attachments.iterrows():
+            col1, col2, col3 = st.columns([1, 3, 1])
+            
+            with col1:
+                thumbnail = get_thumbnail(attachment['sha256'])
+                if thumbnail:
+                    st.image(thumbnail)
+                else:
+                    st.write("📄")
+            
+            with col2:
+                st.write(f"**{attachment['filename']}**")
+                st.caption(f"{attachment['size'] / 1024:,.1f} KB • {attachment['created_at']}")
+                st.download_button(
+                    "📥 Download",
+                    data=partial(read_blob, attachment['sha256']),
+                    file_name=attachment['filename'],
+                    mime=attachment['mime_type'],
+                    key=f"receipt_download_{attachment['id']}"
+                )
+            
+            with col3:
+                if st.button("🗑️", key=f"receipt_del_{attachment['id']}"):
+                    delete_attachment(attachment['id'])
+                    st.rerun()
+
+def show_bulk_editor(transactions, categories):
+    """Editable grid over one page of transactions, saved as a single batch"""
+    grid = transactions[[
+        'id', 'date', 'type', 'amount', 'vendor_client', 'category',
+        'payment_method', 'notes', 'is_reimbursed'
+    ]].copy()
+    grid['date'] = pd.to_datetime(grid['date'], format='ISO8601').dt.date
+    grid['is_reimbursed'] = grid['is_reimbursed'].fillna(0).astype(bool)
+    
+    # Edits stay client-side until the form is submitted
+    with st.form("bulk_edit"):
+        edited = st.data_editor(
+            grid,
+            num_rows="dynamic",
+            hide_index=True,
+            use_container_width=True,
+            disabled=['id'],
+            column_config={
+                'id': st.column_config.NumberColumn("ID"),
+                'date': st.column_config.DateColumn("Date", required=True, default=datetime.now().date()),
+                'type': st.column_config.SelectboxColumn(
+                    "Type", options=["expense", "purchase", "credit"], required=True, default="expense"
+                ),
+                'amount': st.column_config.NumberColumn("Amount", min_value=0.01, step=0.01, format="$%.2f", required=True),
+                'vendor_client': st.column_config.TextColumn("Vendor/Client"),
+                'category': st.column_config.SelectboxColumn("Category", options=categories['name'].tolist()),
+                'payment_method': st.column_config.SelectboxColumn("Payment Method", options=PAYMENT_METHODS),
+                'notes': st.column_config.TextColumn("Notes"),
+                'is_reimbursed': st.column_config.CheckboxColumn("Reimbursed", default=False)
+            }
+        )
+        
+        if st.form_submit_button("💾 Save Changes", use_container_width=True):
+            category_ids = dict(zip(categories['name'], categories['id']))
+            inserts, updates, deletes = diff_transactions(grid, edited, category_ids)
+            if inserts or updates or deletes:
+                apply_transaction_edits(st.session_state.user_id, inserts, updates, deletes)
+                st.success(f"Saved {len(inserts)} added, {len(updates)} edited and {len(deletes)} deleted transactions")
+                st.rerun()
+            else:
+                st.info("No changes to save.")
+
 def show_categories():
     """Categories page"""
     st.title("🏷️ Categories")
@@ -688,23 +2745,86 @@ def show_categories():
     # Display categories
     categories = get_categories(st.session_state.user_id)
     
-    # Get usage stats
-    conn = sqlite3.connect(DB_FILE)
-    usage_query = '''
-        SELECT category_id, COUNT(*) as count, SUM(amount) as total
-        FROM transactions
-        WHERE user_id = ? AND category_id IS NOT NULL
-        GROUP BY category_id
-    '''
-    usage_df = pd.read_sql_query(usage_query, conn, params=(st.session_state.user_id,))
-    conn.close()
+    # Auto-categorization rules
+    with st.expander("🤖 Auto-Categorization Rules"):
+        st.caption(
+            "Transactions added without a category get the first matching rule's category. "
+            "Every condition you fill in has to match; keyword and pattern are checked against vendor/client and notes."
+        )
+        
+        with st.form("add_rule"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                rule_category = st.selectbox("Category", categories['name'].tolist(), key="rule_cat")
+                rule_keyword = st.text_input("Vendor keyword", key="rule_keyword")
+                rule_pattern = st.text_input("Regex pattern", key="rule_pattern")
+            with col2:
+                rule_min = st.number_input("Min amount", min_value=0.0, value=None, step=0.01, key="rule_min")
+                rule_max = st.number_input("Max amount", min_value=0.0, value=None, step=0.01, key="rule_max")
+            with col3:
+                rule_payment = st.selectbox("Payment Method", [""] + PAYMENT_METHODS, key="rule_pay")
+                rule_priority = st.number_input("Priority", value=0, step=1, key="rule_priority")
+            
+            if st.form_submit_button("Add Rule"):
+                rule_category_id = categories[categories['name'] == rule_category]['id'].values[0]
+                if add_category_rule(
+                    st.session_state.user_id, rule_category_id, rule_keyword, rule_pattern,
+                    rule_min, rule_max, rule_payment, int(rule_priority)
+                ):
+                    st.success("Rule added!")
+                    st.rerun()
+                else:
+                    st.error("Invalid regex pattern")
+        
+        rules = get_category_rules(st.session_state.user_id)
+        for _, rule in rules.iterrows():
+            conditions = [
+                f"keyword '{rule['vendor_keyword']}'" if pd.notna(rule['vendor_keyword']) else None,
+                f"pattern /{rule['pattern']}/" if pd.notna(rule['pattern']) else None,
+                f"≥ ${rule['min_amount']:,.2f}" if pd.notna(rule['min_amount']) else None,
+                f"≤ ${rule['max_amount']:,.2f}" if pd.notna(rule['max_amount']) else None,
+                rule['payment_method'] if pd.notna(rule['payment_method']) else None
+            ]
+            col1, col2 = st.columns([5, 1])
+            with col1:
+                st.write(f"**{rule['category']}** ← {' • '.join(c for c in conditions if c) or 'everything'} (priority {rule['priority']})")
+            with col2:
+                if st.button("🗑️", key=f"rule_del_{rule['id']}"):
+                    delete_category_rule(rule['id'])
+                    st.rerun()
+        
+        if not rules.empty and st.button("🤖 Categorize Uncategorized Transactions"):
+            updated = backfill_categories(st.session_state.user_id)
+            st.success(f"Categorized {updated} transactions")
+    
+    # Monthly budgets
+    budgets = get_category_budgets(st.session_state.user_id)
+    with st.expander("💰 Monthly Budgets"):
+        with st.form("set_budget"):
+            col1, col2 = st.columns(2)
+            with col1:
+                budget_category = st.selectbox("Category", categories['name'].tolist(), key="budget_cat")
+            with col2:
+                budget_amount = st.number_input("Monthly budget (0 removes it)", min_value=0.0, step=10.0, key="budget_amount")
+            
+            if st.form_submit_button("Save Budget"):
+                budget_category_id = categories[categories['name'] == budget_category]['id'].values[0]
+                set_category_budget(st.session_state.user_id, budget_category_id, budget_amount)
+                st.success("Budget saved!")
+                st.rerun()
+    
+    for level, message in budget_alerts(budgets):
+        getattr(st, level)(message)
+    
+    # Usage and this month's budget use, from the running counters
+    usage = get_category_usage(st.session_state.user_id).set_index('category_id')
+    budgets = budgets.set_index('category_id')
     
     col1, col2, col3 = st.columns(3)
     
     for idx, row in categories.iterrows():
-        usage = usage_df[usage_df['category_id'] == row['id']]
-        count = int(usage['count'].values[0]) if not usage.empty else 0
-        total = float(usage['total'].values[0]) if not usage.empty else 0
+        count = int(usage.at[row['id'], 'count']) if row['id'] in usage.index else 0
+        total = float(usage.at[row['id'], 'total']) if row['id'] in usage.index else 0
         
         with [col1, col2, col3][idx % 3]:
             with st.container():
@@ -717,6 +2837,12 @@ def show_categories():
                     f"</div>",
                     unsafe_allow_html=True
                 )
+                if row['id'] in budgets.index:
+                    budget = budgets.loc[row['id']]
+                    st.progress(
+                        min(float(budget['utilization']), 1.0),
+                        text=f"${budget['spent']:,.2f} of ${budget['budget']:,.2f} this month"
+                    )
                 st.write("")
 
 def show_recurring():
@@ -813,6 +2939,9 @@ def show_credits():
     """Credits tracking page"""
     st.title("💳 Credits Tracking")
     
+    # Bring statuses up to date before anything below counts or lists them
+    mark_overdue_credits(st.session_state.user_id)
+    
     # Add credit
     with st.expander("➕ Add Credit/Invoice"):
         with st.form("add_credit"):
@@ -831,32 +2960,72 @@ def show_credits():
                 st.success("Credit added!")
                 st.rerun()
     
+    summary = get_credit_summary(st.session_state.user_id)
+    if not summary['invoices']:
+        st.info("No credits to track yet.")
+        return
+    
+    # Summary
+    col1, col2, col3 = st.columns(3)
+    col1.metric("⏳ Pending", f"${summary['pending']:,.2f}")
+    col2.metric("✅ Paid", f"${summary['paid']:,.2f}")
+    col3.metric("⚠️ Overdue", f"${summary['overdue']:,.2f}")
+    
+    # Aging
+    st.subheader("Receivables Aging")
+    for col, (column, label, _, _) in zip(st.columns(len(AGING_BUCKETS)), AGING_BUCKETS):
+        col.metric(label, f"${summary[column]:,.2f}")
+    
+    with st.expander("🚩 Top Overdue Clients"):
+        clients = get_client_balances(st.session_state.user_id)
+        if not clients.empty:
+            st.dataframe(
+                clients.rename(columns={
+                    'client_name': 'Client',
+                    'invoices': 'Open Invoices',
+                    'outstanding': 'Outstanding',
+                    'overdue': 'Overdue',
+                    'oldest_due': 'Oldest Due',
+                    **{column: label for column, label, _, _ in AGING_BUCKETS}
+                }),
+                hide_index=True,
+                use_container_width=True
+            )
+        else:
+            st.caption("No outstanding invoices.")
+    
+    st.divider()
+    
     # Filters
-    status_filter = st.selectbox("Filter by Status", ["All", "pending", "paid", "overdue"])
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        status_filter = st.selectbox("Filter by Status", ["All", "pending", "paid", "overdue"])
+    status_filter = status_filter if status_filter != "All" else None
+    
+    total_credits = count_credits(st.session_state.user_id, status_filter)
+    with col2:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1)
+    with col3:
+        page_no = st.number_input(
+            "Page",
+            min_value=1,
+            max_value=max(1, -(-total_credits // page_size)),
+            value=1,
+            step=1
+        )
     
     # Get credits
+    offset = (page_no - 1) * page_size
     credits = get_credits(
         st.session_state.user_id,
-        status_filter if status_filter != "All" else None
+        status_filter,
+        columns=['id', 'client_name', 'amount', 'due_date', 'status', 'notes'],
+        limit=page_size,
+        offset=offset
     )
     
-    # Summary
     if not credits.empty:
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            pending = credits[credits['status'] == 'pending']['amount'].sum()
-            st.metric("⏳ Pending", f"${pending:,.2f}")
-        
-        with col2:
-            paid = credits[credits['status'] == 'paid']['amount'].sum()
-            st.metric("✅ Paid", f"${paid:,.2f}")
-        
-        with col3:
-            overdue = credits[credits['status'] == 'overdue']['amount'].sum()
-            st.metric("⚠️ Overdue", f"${overdue:,.2f}")
-        
-        st.divider()
+        st.caption(f"Showing {offset + 1}–{offset + len(credits)} of {total_credits}")
         
         # Display credits
         for idx, row in credits.iterrows():
@@ -887,7 +3056,7 @@ def show_credits():
                 
                 st.divider()
     else:
-        st.info("No credits to track yet.")
+        st.info("No credits match this filter.")
 
 def show_reports():
     """Reports page"""
@@ -901,22 +3070,46 @@ def show_reports():
         report_end = st.date_input("End Date", value=datetime.now().date())
     
     # Get data
-    summary = get_dashboard_data(st.session_state.user_id, report_start, report_end)
+    comparison = get_period_comparison(st.session_state.user_id, report_start, report_end)
     transactions = get_transactions(st.session_state.user_id, {'start_date': report_start, 'end_date': report_end})
     category_data = get_category_breakdown(st.session_state.user_id, report_start, report_end)
     
-    # Summary
-    total_income = summary[summary['type'] == 'credit']['total'].sum() if 'credit' in summary['type'].values else 0
-    total_expenses = summary[summary['type'].isin(['purchase', 'expense'])]['total'].sum()
-    net_profit = total_income - total_expenses
-    
+    # Summary (compared with the equally long period right before the range)
+    compare_label = f"vs the previous {(report_end - report_start).days + 1} days"
     col1, col2, col3 = st.columns(3)
-    col1.metric("Income", f"${total_income:,.2f}")
-    col2.metric("Expenses", f"${total_expenses:,.2f}")
-    col3.metric("Net Profit", f"${net_profit:,.2f}", delta=f"${net_profit:,.2f}")
+    col1.metric("Income", f"${comparison['income']:,.2f}", **comparison_metric_args(comparison, 'income', compare_label))
+    col2.metric("Expenses", f"${comparison['expenses']:,.2f}", **comparison_metric_args(comparison, 'expenses', compare_label))
+    col3.metric("Net Profit", f"${comparison['net']:,.2f}", **comparison_metric_args(comparison, 'net', compare_label))
     
     st.divider()
     
+    # Rolling spend
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.subheader("Rolling Spend by Category")
+    with col2:
+        rolling_window = st.selectbox(
+            "Rolling window",
+            ROLLING_WINDOWS,
+            format_func=lambda days: f"{days}-day",
+            label_visibility="collapsed"
+        )
+    
+    rolling = get_rolling_category_spend(st.session_state.user_id, report_start, report_end)
+    if not rolling.empty:
+        colors = rolling.drop_duplicates('category').set_index('category')['color'].fillna('#95A5A6').to_dict()
+        fig = px.line(
+            rolling,
+            x='day',
+            y=f'rolling_{rolling_window}',
+            color='category',
+            color_discrete_map=colors,
+            labels={'day': 'Date', f'rolling_{rolling_window}': f'{rolling_window}-day spend', 'category': 'Category'}
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("No expense data in this range")
+    
     # Category breakdown
     if not category_data.empty:
         st.subheader("Spending by Category")
@@ -953,6 +3146,48 @@ def show_reports():
             mime="text/csv",
             use_container_width=True
         )
+    
+    # Archive
+    with st.expander("🗄️ Data Archive"):
+        st.caption("Closed years are moved out of the live table. Pages only read archived years when their date range reaches them.")
+        
+        archived = get_archived_years()
+        if not archived.empty:
+            st.dataframe(
+                archived.rename(columns={
+                    'year': 'Year',
+                    'row_count': 'Transactions',
+                    'archived_at': 'Archived At'
+                }),
+                hide_index=True,
+                use_container_width=True
+            )
+        
+        # Archiving and compaction affect every user's data
+        if st.session_state.username in ADMIN_USERNAMES:
+            st.caption("Archiving moves closed years for all users.")
+            archive_read_only = st.checkbox(
+                "Make archive file read-only",
+                key="archive_read_only",
+                help="Only clears the file's write permission bits, which a process running as root ignores. "
+                     "The app itself always opens the archive read-only outside of archiving."
+            )
+            if st.button("🗄️ Archive Closed Years"):
+                years = archive_closed_years(read_only=archive_read_only)
+                if years:
+                    st.success(f"Archived {', '.join(str(year) for year in years)}")
+                else:
+                    st.info("No closed years to archive.")
+            
+            st.caption(f"The change log keeps {CHANGE_LOG_RETENTION_DAYS} days of history for incremental sync.")
+            if st.button("🧹 Compact Change Log"):
+                removed = compact_change_log()
+                st.success(f"Removed {removed} change log entries")
+        
+        st.caption("Running balances are kept up to date as transactions change and keep archived years.")
+        if st.button("🔁 Rebuild Running Balances"):
+            rebuild_daily_balances(st.session_state.user_id)
+            st.success("Running balances rebuilt")
 
 # Main app logic
 if not st.session_state.logged_in:
@@ -0,0 +1,193 @@
+"""Concurrent-session load test for the expense tracker
+
+Each simulated session runs the real app script through Streamlit's AppTest
+in its own process: it logs in through the login page, walks every sidebar
+page, adds transactions and credits and marks credits paid. All sessions share
+one seeded SQLite database, so the numbers include real write contention.
+
+Usage:
+    python load_test.py --sessions 8 --iterations 5
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from streamlit.testing.v1 import AppTest
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+DB_FILE = 'expense_tracker.db'
+PASSWORD = 'loadtest'
+
+
+def hash_password(password):
+    """Hash password the same way the app does"""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def seed_database(workdir, users, transactions_per_user, credits_per_user):
+    """Create the schema by running the app once, then bulk-load test data"""
+    os.chdir(workdir)
+    AppTest.from_file(APP_FILE, default_timeout=60).run()
+
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    today = datetime.now().date()
+    rng = random.Random(42)
+
+    for i in range(users):
+        cursor.execute(
+            'INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+            (f'loadtest_{i}', f'loadtest_{i}@example.com', hash_password(PASSWORD))
+        )
+        user_id = cursor.lastrowid
+        cursor.executemany('''
+            INSERT INTO transactions (user_id, type, amount, date, vendor_client, category_id, payment_method, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (
+                user_id,
+                rng.choice(['expense', 'purchase', 'credit']),
+                round(rng.uniform(5, 2000), 2),
+                today - timedelta(days=rng.randint(0, 730)),
+                f'Vendor {rng.randint(1, 200)}',
+                rng.randint(1, 8),
+                rng.choice(['Credit Card', 'Cash', 'E-transfer']),
+                ''
+            )
+            for _ in range(transactions_per_user)
+        ])
+        cursor.executemany('''
+            INSERT INTO credits_tracking (user_id, client_name, amount, due_date, notes)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [
+            (user_id, f'Client {rng.randint(1, 50)}', round(rng.uniform(100, 5000), 2),
+             today + timedelta(days=rng.randint(-90, 90)), '')
+            for _ in range(credits_per_user)
+        ])
+
+    # The rows above bypass the app's write path, so have the app rebuild its
+    # derived tables (balances, anomaly stats, category spend) from them
+    cursor.execute('DELETE FROM derived_tables')
+    conn.commit()
+    conn.close()
+    AppTest.from_file(APP_FILE, default_timeout=600).run()
+
+
+def find_button(at, label):
+    """First button (including form submit buttons) with the given label"""
+    return next(button for button in at.button if button.label == label)
+
+
+def run_session(args):
+    """Drive one logged-in session and return its timings and errors"""
+    workdir, session_no, iterations = args
+    os.chdir(workdir)
+
+    latencies = []
+    errors = {'locked': 0, 'other': 0}
+
+    def step(action):
+        """Run one user action, recording latency and script exceptions"""
+        start = time.perf_counter()
+        at = action()
+        latencies.append(time.perf_counter() - start)
+        for exception in at.exception:
+            if 'database is locked' in exception.value:
+                errors['locked'] += 1
+            else:
+                errors['other'] += 1
+        return at
+
+    at = step(lambda: AppTest.from_file(APP_FILE, default_timeout=60).run())
+    at.text_input[0].input(f'loadtest_{session_no}')
+    at.text_input[1].input(PASSWORD)
+    at = step(lambda: find_button(at, 'Login').click().run())
+
+    pages = at.sidebar.radio[0].options
+    for _ in range(iterations):
+        for page in pages:
+            at = step(lambda: at.sidebar.radio[0].set_value(page).run())
+
+            if page == '💸 Transactions':
+                at.number_input[0].set_value(round(random.uniform(5, 500), 2))
+                at.text_input[0].input(f'Load Vendor {session_no}')
+                at = step(lambda: find_button(at, '💾 Add Transaction').click().run())
+
+            elif page == '💳 Credits':
+                at.text_input[0].input(f'Load Client {session_no}')
+                at.number_input[0].set_value(250.0)
+                at = step(lambda: find_button(at, 'Add Credit').click().run())
+                paid = [button for button in at.button if button.label == '✓ Paid']
+                if paid:
+                    at = step(lambda: paid[0].click().run())
+
+    # ru_maxrss is reported in KiB on Linux
+    rss_mib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return latencies, errors, rss_mib
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of values"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=4, help='concurrent sessions')
+    parser.add_argument('--iterations', type=int, default=3, help='passes over the sidebar pages per session')
+    parser.add_argument('--transactions', type=int, default=5000, help='seeded transactions per user')
+    parser.add_argument('--credits', type=int, default=200, help='seeded credits per user')
+    parser.add_argument('--keep', action='store_true', help='keep the seeded working directory')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='expense_load_')
+    print(f'Seeding {args.sessions} users into {workdir}')
+    # AppTest takes over __main__ in whichever process runs it, so seeding and
+    # every session get a fresh process of their own
+    context = multiprocessing.get_context('spawn')
+    seeder = context.Process(
+        target=seed_database,
+        args=(workdir, args.sessions, args.transactions, args.credits)
+    )
+    seeder.start()
+    seeder.join()
+
+    start = time.perf_counter()
+    with context.Pool(args.sessions, maxtasksperchild=1) as pool:
+        results = pool.map(run_session, [(workdir, i, args.iterations) for i in range(args.sessions)])
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for result in results for latency in result[0]]
+    locked = sum(result[1]['locked'] for result in results)
+    other = sum(result[1]['other'] for result in results)
+    rss = [result[2] for result in results]
+
+    print(f'Sessions:        {args.sessions}')
+    print(f'Actions:         {len(latencies)} in {elapsed:.1f}s')
+    print(f'Throughput:      {len(latencies) / elapsed:.1f} actions/s')
+    print(f'Latency p50:     {percentile(latencies, 50) * 1000:.0f} ms')
+    print(f'Latency p95:     {percentile(latencies, 95) * 1000:.0f} ms')
+    print(f'Latency p99:     {percentile(latencies, 99) * 1000:.0f} ms')
+    print(f'Latency max:     {max(latencies) * 1000:.0f} ms')
+    print(f'Locked errors:   {locked} ({locked / len(latencies):.2%} of actions)')
+    print(f'Other errors:    {other}')
+    print(f'RSS per session: avg {sum(rss) / len(rss):.0f} MiB, max {max(rss):.0f} MiB')
+
+    if args.keep:
+        print(f'Database kept at {os.path.join(workdir, DB_FILE)}')
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()